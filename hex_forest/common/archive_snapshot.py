@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+All finished games in one read-only file, memory-mapped by every HTTP worker so that they share a single copy.
+
+Layout, little-endian, each section right after the previous one:
+
+- header: `HEADER` with magic, format version, number of games and total number of moves
+- offsets: int64 per game plus one, moves of game `i` are `offsets[i]:offsets[i + 1]`
+- openings: int16 cell indices of the first `OPENING_PLIES` moves per game, as `PrefixMatcher` reads them
+- sizes: uint8 board size per game, games are ordered by it
+- results: int8 per game, 1 if black won (taking the swap into account) otherwise 0
+- xs, ys: int8 coordinates per move, -1 for a pass
+
+The file is written next to the target and renamed over it, so a reader always maps a complete snapshot.
+"""
+from __future__ import annotations
+
+import asyncio
+import mmap
+import os
+import struct
+import traceback
+from array import array
+from time import monotonic
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from hex_forest.common.codec import decode_cells, pass_code
+from hex_forest.common.openings import Suggestion
+from hex_forest.common.prefix_matcher import NO_CELL, OPENING_PLIES, PrefixMatcher
+
+if TYPE_CHECKING:
+    from hex_forest.models.move import FakeMove
+
+MAGIC: bytes = b"HXAR"
+VERSION: int = 2
+HEADER = struct.Struct("<4sIQQ")
+
+EXPORT_SECONDS: float = 600.0
+"""Time between rebuilds of the snapshot by the `snapshot` target of `hex_forest.run`."""
+
+CHECK_SECONDS: float = 5.0
+"""Time between checks of a reader whether the snapshot file was replaced."""
+
+
+class SnapshotError(Exception):
+    """"""
+
+
+class ArchiveSnapshot:
+    """
+    NumPy views on a memory-mapped snapshot file, nothing is copied into the process.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as file:
+            self.inode = os.fstat(file.fileno()).st_ino
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n_games, n_moves = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotError(f"not an archive snapshot of version {VERSION}: {path}")
+
+        self.n_games: int = n_games
+        self.n_moves: int = n_moves
+
+        position = HEADER.size
+        self.offsets, position = self._view("<i8", n_games + 1, position)
+        self.openings, position = self._view("<i2", n_games * OPENING_PLIES, position)
+        self.openings = self.openings.reshape(n_games, OPENING_PLIES)
+        self.sizes, position = self._view("u1", n_games, position)
+        self.results, position = self._view("i1", n_games, position)
+        self.xs, position = self._view("i1", n_moves, position)
+        self.ys, position = self._view("i1", n_moves, position)
+
+    def _view(self, dtype: str, count: int, position: int) -> Tuple[np.ndarray, int]:
+        view = np.frombuffer(self.buffer, dtype=dtype, count=count, offset=position)
+        return view, position + view.nbytes
+
+    def matcher(self, size: int) -> PrefixMatcher:
+        """
+        Matcher of games of the board size, on views of the file.
+        """
+
+        start, end = np.searchsorted(self.sizes, [size, size + 1])
+        return PrefixMatcher(self.openings[start:end], self.results[start:end], size)
+
+    def suggestions(self, moves: Sequence[FakeMove], size: int) -> List[Suggestion]:
+        """"""
+
+        return self.matcher(size).suggestions(moves)
+
+    def review(self, moves: Sequence[FakeMove], size: int) -> List[List[Suggestion]]:
+        """"""
+
+        return self.matcher(size).review(moves)
+
+
+class SnapshotReader:
+    """
+    The latest snapshot of a path, reopened when the file is replaced.
+    """
+
+    def __init__(self, path: Optional[str]) -> None:
+        """
+        :param path: None if snapshots are not used
+        """
+
+        self.path = path
+        self.snapshot: Optional[ArchiveSnapshot] = None
+        self.checked_at: float = -CHECK_SECONDS
+
+    def get(self) -> Optional[ArchiveSnapshot]:
+        """
+        The snapshot or None if there is no valid file.
+
+        A replaced snapshot is not closed, its memory is released once no query uses its views anymore.
+        """
+
+        if self.path is None or monotonic() - self.checked_at < CHECK_SECONDS:
+            return self.snapshot
+        self.checked_at = monotonic()
+
+        try:
+            inode = os.stat(self.path).st_ino
+            if self.snapshot is None or self.snapshot.inode != inode:
+                self.snapshot = ArchiveSnapshot(self.path)
+        except FileNotFoundError:
+            self.snapshot = None
+        except (OSError, SnapshotError, ValueError):
+            traceback.print_exc()
+
+        return self.snapshot
+
+
+def write_snapshot(
+    path: str, sizes: array, results: array, lengths: array, openings: array, xs: array, ys: array
+) -> None:
+    """
+    Write the sections to a temporary file and rename it over the path.
+    """
+
+    offsets = np.zeros(len(lengths) + 1, dtype="<i8")
+    np.cumsum(np.frombuffer(lengths, dtype=np.uint32), out=offsets[1:])
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(sizes), len(xs)))
+        file.write(offsets.tobytes())
+        file.write(np.frombuffer(openings, dtype=np.int16).astype("<i2").tobytes())
+        for section in (sizes, results, xs, ys):
+            file.write(section.tobytes())
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temporary, path)
+
+
+async def export_snapshot(path: str, batch_size: int = 1000) -> None:
+    """
+    Rebuild the snapshot with all finished games.
+    """
+
+    from hex_forest.models.game import Game, Status
+
+    sizes = array("B")
+    results = array("b")
+    lengths = array("I")
+    openings = array("h")
+    xs = array("b")
+    ys = array("b")
+
+    finished = Game.filter(status__in=[Status.WHITE_WON, Status.BLACK_WON])
+    for size in sorted(set(await finished.values_list("board_size", flat=True))):
+        pass_ = pass_code(size)
+
+        last_id = 0
+        while True:
+            games = await finished.filter(board_size=size, id__gt=last_id).order_by("id").limit(batch_size)
+            if not games:
+                break
+
+            for game in games:
+                cells = [NO_CELL if cell == pass_ else cell for cell in decode_cells(game.packed_moves or b"", size)]
+
+                sizes.append(size)
+                results.append(game.black_won)
+                lengths.append(len(cells))
+                openings.extend(cells[:OPENING_PLIES] + [NO_CELL] * (OPENING_PLIES - len(cells)))
+                xs.extend(NO_CELL if cell == NO_CELL else cell % size for cell in cells)
+                ys.extend(NO_CELL if cell == NO_CELL else cell // size for cell in cells)
+            last_id = games[-1].id
+
+    await asyncio.get_running_loop().run_in_executor(
+        None, write_snapshot, path, sizes, results, lengths, openings, xs, ys
+    )
+    print(f"archive snapshot of {len(sizes)} games written to {path}")
+
+
+async def export_forever(path: str) -> None:
+    """
+    Rebuild the snapshot now and then every `EXPORT_SECONDS`.
+    """
+
+    while True:
+        try:
+            await export_snapshot(path)
+        except Exception:
+            traceback.print_exc()
+        await asyncio.sleep(EXPORT_SECONDS)
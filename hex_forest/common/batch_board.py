@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from typing import Iterable, List, Sequence
+
+import numpy as np
+
+from hex_forest.common import BitBoard
+from hex_forest.common.board import Board
+from hex_forest.common.codec import Packed, decode_bitboards, decode_cells
+from hex_forest.common.geometry import BoardGeometry, get_geometry
+
+WORD_BITS: int = 64
+
+NO_WINNER: int = -1
+"""Value in `BatchBoard.winner` result for a position that is not finished."""
+
+
+def to_words(bb: BitBoard, n_words: int) -> np.ndarray:
+    """"""
+
+    return np.frombuffer(bb.to_bytes(n_words * 8, "little"), dtype="<u8")
+
+
+def from_words(words: np.ndarray) -> BitBoard:
+    """"""
+
+    return int.from_bytes(words.astype("<u8").tobytes(), "little")
+
+
+class BatchBoard:
+    """
+    Many positions of the same board size, evaluated all at once.
+
+    Each position is a row of 64-bit words with cell `x + y * size` at bit `cell % 64` of word `cell // 64`,
+    same as a `BitBoard` split into words.
+    """
+
+    size: int
+    geometry: BoardGeometry
+    n_words: int
+
+    occupied_co: List[np.ndarray]
+    """Black and white stones, each an array of shape (N, n_words)."""
+
+    turn: np.ndarray
+    """The side to move per position, True for white, False for black."""
+
+    def __init__(self, blacks: np.ndarray, whites: np.ndarray, turn: np.ndarray, *, size: int = 13) -> None:
+        self.size = size
+        self.geometry = get_geometry(size)
+        self.n_words = (self.geometry.n + WORD_BITS - 1) // WORD_BITS
+
+        self.occupied_co = [blacks, whites]
+        self.turn = turn
+
+        self.full = self.mask(self.geometry.full)
+        self.not_left = self.mask(self.geometry.not_left)
+        self.not_right = self.mask(self.geometry.not_right)
+
+    def __len__(self) -> int:
+        return len(self.turn)
+
+    @classmethod
+    def from_boards(cls, boards: Sequence[Board]) -> BatchBoard:
+        """"""
+
+        size = boards[0].size
+        n_words = (size**2 + WORD_BITS - 1) // WORD_BITS
+
+        blacks = np.empty((len(boards), n_words), dtype=np.uint64)
+        whites = np.empty((len(boards), n_words), dtype=np.uint64)
+        for i, board in enumerate(boards):
+            blacks[i] = to_words(board.occupied_co[False], n_words)
+            whites[i] = to_words(board.occupied_co[True], n_words)
+
+        turn = np.fromiter((board.turn for board in boards), dtype=bool, count=len(boards))
+        return cls(blacks, whites, turn, size=size)
+
+    @classmethod
+    def from_packed(cls, sequences: Iterable[Packed], size: int) -> BatchBoard:
+        """
+        Positions at the end of move sequences encoded by `hex_forest.common.codec`.
+        """
+
+        n_words = (size**2 + WORD_BITS - 1) // WORD_BITS
+
+        blacks = []
+        whites = []
+        turn = []
+        for sequence in sequences:
+            black, white = decode_bitboards(sequence, size)
+            blacks.append(to_words(black, n_words))
+            whites.append(to_words(white, n_words))
+            turn.append(len(decode_cells(sequence, size)) % 2 == 1)
+
+        return cls(
+            np.array(blacks, dtype=np.uint64).reshape(-1, n_words),
+            np.array(whites, dtype=np.uint64).reshape(-1, n_words),
+            np.array(turn, dtype=bool),
+            size=size,
+        )
+
+    def mask(self, bb: BitBoard) -> np.ndarray:
+        """
+        Words of a single bitboard, broadcastable against all positions.
+        """
+
+        return to_words(bb, self.n_words)[np.newaxis, :]
+
+    @staticmethod
+    def shift_left(a: np.ndarray, k: int) -> np.ndarray:
+        """
+        Shift every position towards higher bits, carrying between words.
+        """
+
+        out = a << np.uint64(k)
+        out[:, 1:] |= a[:, :-1] >> np.uint64(WORD_BITS - k)
+        return out
+
+    @staticmethod
+    def shift_right(a: np.ndarray, k: int) -> np.ndarray:
+        """
+        Shift every position towards lower bits, carrying between words.
+        """
+
+        out = a >> np.uint64(k)
+        out[:, :-1] |= a[:, 1:] << np.uint64(WORD_BITS - k)
+        return out
+
+    def dilate(self, a: np.ndarray) -> np.ndarray:
+        """
+        Extend every position by all neighbouring cells, same as `Board.dilate`.
+        """
+
+        size = self.size
+        not_left = a & self.not_left
+        not_right = a & self.not_right
+
+        return (
+            a
+            | self.shift_left(not_right, 1)
+            | self.shift_right(not_left, 1)
+            | self.shift_left(a, size)
+            | self.shift_right(a, size)
+            | self.shift_left(not_left, size - 1)
+            | self.shift_right(not_right, size - 1)
+        ) & self.full
+
+    def connected(self, stones: np.ndarray, edge: BitBoard, until: BitBoard = 0) -> np.ndarray:
+        """
+        Stones connected to the edge, grown for all positions until none of them changes or reaches `until`.
+
+        Positions that stopped growing are dropped from the working set, so that a few long chains do not make every
+        position pay for all the iterations.
+        """
+
+        connected = stones & self.mask(edge)
+        until_mask = self.mask(until)
+
+        active = np.flatnonzero(connected.any(axis=1) & ~(connected & until_mask).any(axis=1))
+        while len(active):
+            current = connected[active]
+            grown = self.dilate(current) & stones[active]
+
+            changed = (grown != current).any(axis=1)
+            active = active[changed]
+            grown = grown[changed]
+            connected[active] = grown
+
+            active = active[~(grown & until_mask).any(axis=1)]
+
+        return connected
+
+    def is_black_win(self) -> np.ndarray:
+        """"""
+
+        connected = self.connected(self.occupied_co[False], self.geometry.rows[0], self.geometry.bottom_row)
+        return (connected & self.mask(self.geometry.bottom_row)).any(axis=1)
+
+    def is_white_win(self) -> np.ndarray:
+        """"""
+
+        connected = self.connected(self.occupied_co[True], self.geometry.cols[0], self.geometry.right_col)
+        return (connected & self.mask(self.geometry.right_col)).any(axis=1)
+
+    def winner(self) -> np.ndarray:
+        """
+        Per position 0 for black win, 1 for white win or `NO_WINNER`, following the same rules as `Board.winner`.
+        """
+
+        result = np.full(len(self), NO_WINNER, dtype=np.int8)
+        result[self.turn & self.is_black_win()] = 0
+        result[~self.turn & self.is_white_win()] = 1
+        return result
+
+    def stone_count(self, color: bool) -> np.ndarray:
+        """
+        Number of stones of the color per position.
+        """
+
+        return np.unpackbits(self.occupied_co[color].view(np.uint8), axis=1).sum(axis=1)
+
+    def reach(self, color: bool) -> np.ndarray:
+        """
+        Simple evaluation: number of rows (for black) or columns (for white) spanned by stones connected to the
+        color's first edge, so `size` means a win.
+        """
+
+        lines = self.geometry.cols if color else self.geometry.rows
+        connected = self.connected(self.occupied_co[color], lines[0])
+
+        reach = np.zeros(len(self), dtype=np.int16)
+        for line in lines:
+            reach += (connected & self.mask(line)).any(axis=1)
+        return reach
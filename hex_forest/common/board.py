@@ -1,13 +1,15 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-from functools import reduce
+from enum import IntEnum
 from itertools import groupby
-from operator import ior
-from typing import Dict, Generator, Iterator, List, Optional
+from typing import Dict, Generator, Iterator, List, Optional, Tuple
 
 from hex_forest.common import BitBoard
-from hex_forest.common.cell import Cell
+from hex_forest.common.cell import CellGeometry, get_cell_rows
+from hex_forest.common.codec import Packed, decode_moves
+from hex_forest.common.geometry import BoardGeometry, get_geometry
+from hex_forest.common.zobrist import Symmetry, ZobristKeys, get_zobrist_keys
 from hex_forest.models.move import FakeMove
 
 
@@ -18,10 +20,34 @@ def generate_masks(bb: BitBoard) -> Iterator:
         bb ^= r
 
 
+BLACK_DIRECTIONS: Tuple[str, ...] = ("right", "down", "downleft", "left", "upright", "up")
+WHITE_DIRECTIONS: Tuple[str, ...] = ("down", "right", "upright", "up", "downleft", "left")
+"""Neighbours in optimized order to find a connection for each color."""
+
+
 class BoardShapeError(Exception):
     """"""
 
 
+class Connectivity(IntEnum):
+    """
+    Engine used to find a winning chain on the board.
+    """
+
+    RECURSIVE = 0
+    """Depth-first walk from stone to stone, one neighbour at a time."""
+
+    FLOOD_FILL = 1
+    """Whole-board shift-and-mask dilation from an edge until the chain stops growing."""
+
+    UNION_FIND = 2
+    """Disjoint sets of stones with virtual edge nodes, merged on every `push` and unmerged on every `pop`."""
+
+
+Union = Tuple[int, int, bool]
+"""Root attached, root it was attached to and whether the rank of the latter was incremented."""
+
+
 class Board:
     """"""
 
@@ -34,65 +60,121 @@ class Board:
     occupied_co: Dict[bool, BitBoard]
     unoccupied: BitBoard
 
-    def __init__(self, notation: Optional[str] = None, *, size: int = 13) -> None:
+    connectivity: Connectivity
+    """Engine used by `is_black_win` and `is_white_win`."""
+
+    geometry: BoardGeometry
+    """Masks and tables shared by all boards of the same size."""
+
+    zobrist_keys: ZobristKeys
+    hashes: List[int]
+    """Zobrist hash of the position transformed by each `Symmetry`, updated on every `push` and `pop`."""
+
+    parent: List[int]
+    """Union-find forest over all cells followed by the top, bottom, left and right virtual edge nodes."""
+
+    rank: List[int]
+
+    union_stack: List[List[Union]]
+    """Unions done by each move on the `move_stack`, used to undo them on `pop`."""
+
+    def __init__(
+        self,
+        notation: Optional[str] = None,
+        *,
+        size: int = 13,
+        connectivity: Connectivity = Connectivity.FLOOD_FILL,
+        packed: Optional[Packed] = None,
+    ) -> None:
         self.size = size
+        self.connectivity = connectivity
         self.rows = self.generate_rows(size)
 
-        self.reset_board()
+        self.geometry = get_geometry(size)
+        self.bb_rows: Tuple[BitBoard, ...] = self.geometry.rows
+        self.bb_cols: Tuple[BitBoard, ...] = self.geometry.cols
+        self.zobrist_keys = get_zobrist_keys(size)
 
-        self.bb_rows: List[BitBoard] = [
-            reduce(ior, [1 << (col + row * size) for col in range(size)])
-            for row in range(size)
-        ]
-        self.bb_cols: List[BitBoard] = [
-            reduce(ior, [(1 << col) << (row * size) for row in range(size)])
-            for col in range(size)
-        ]
         self.vertical_coeff = 2 ** self.size
         self.diagonal_coeff = 2 ** (self.size - 1)
         self.reset_board()
 
         if notation:
             self.initialize_notation(notation)
+        elif packed:
+            self.initialize_packed(packed)
 
     def reset_board(self) -> None:
         """"""
 
         self.turn = False
         self.occupied_co = {False: 0, True: 0}
-        self.unoccupied = (1 << self.size**2) - 1
+        self.unoccupied = self.geometry.full
         self.move_stack = []
+        self.hashes = [0] * len(Symmetry)
+
+        if self.connectivity is Connectivity.UNION_FIND:
+            self.parent = list(range(self.geometry.n + 4))
+            self.rank = [0] * (self.geometry.n + 4)
+        else:
+            self.parent = []
+            self.rank = []
+        self.union_stack = []
 
     def initialize_notation(self, notation: str) -> None:
         """"""
 
         move_str: str = ""
-        color: bool = False
-        i = 0
         for is_letter, value in groupby(notation, str.isalpha):
             move_str += "".join(value)
             if not is_letter:
-                move = FakeMove.from_coord(i, move_str)
-                self.occupied_co[color] |= move.get_mask(self.size)
-                self.move_stack.append(move)
+                self.push(FakeMove.from_coord(len(self.move_stack), move_str))
 
                 move_str = ""
-                color = not color
 
-        self.unoccupied ^= (self.occupied_co[True] | self.occupied_co[False])
+    def initialize_packed(self, packed: Packed) -> None:
+        """
+        Play a move sequence encoded by `hex_forest.common.codec.encode_moves`.
+        """
 
-        self.turn = color
+        for move in decode_moves(packed, self.size):
+            self.push(move)
 
     @staticmethod
-    def generate_rows(size):
-        rows = []
-        for y in range(size):
-            cells = []
-            for x in range(size):
-                cell = Cell(x, y)
-                cells.append(cell)
-            rows.append(cells)
-        return rows
+    def generate_rows(size: int) -> Tuple[Tuple[CellGeometry, ...], ...]:
+        return get_cell_rows(size)
+
+    @property
+    def zobrist_hash(self) -> int:
+        """
+        64-bit hash of the stones on board.
+        """
+
+        return self.hashes[Symmetry.IDENTITY]
+
+    @property
+    def canonical_hash(self) -> int:
+        """
+        Hash equal for all positions equivalent by rotation and color swap.
+        """
+
+        return min(self.hashes)
+
+    @property
+    def canonical_symmetry(self) -> Symmetry:
+        """
+        Symmetry that transforms this position into the one `canonical_hash` describes.
+        """
+
+        hashes = self.hashes
+        return Symmetry(hashes.index(min(hashes)))
+
+    def toggle_hash(self, cell: int, color: bool) -> None:
+        """
+        Add or remove a stone from all hashes, which is the same operation.
+        """
+
+        self.hashes = [h ^ keys[color][cell] for h, keys in zip(self.hashes, self.zobrist_keys)]
 
     def is_game_over(self) -> bool:
         """"""
@@ -113,6 +195,14 @@ class Board:
     def is_black_win(self) -> bool:
         """"""
 
+        if self.connectivity is Connectivity.UNION_FIND:
+            return self.find(self.geometry.top) == self.find(self.geometry.bottom)
+
+        elif self.connectivity is Connectivity.FLOOD_FILL:
+            return self.is_connected(
+                self.occupied_co[False], self.bb_rows[0], self.bb_rows[self.size - 1]
+            )
+
         blacks: BitBoard = self.occupied_co[False]
 
         # check there is a black stone on every row
@@ -149,25 +239,24 @@ class Board:
 
         blacks: BitBoard = self.occupied_co[False]
 
-        for f in (
-            self.cell_right,
-            self.cell_down,
-            self.cell_downleft,
-            self.cell_left,
-            self.cell_upright,
-            self.cell_up,
-        ):
-            try:
-                neighbour_cell = f(mask)
-            except BoardShapeError:
-                continue
-            else:
+        for direction in BLACK_DIRECTIONS:
+            shift, movable = self.geometry.shifts[direction]
+            if mask & movable:
+                neighbour_cell = mask << shift if shift > 0 else mask >> -shift
                 if neighbour_cell & blacks & ~visited:
                     yield neighbour_cell
 
     def is_white_win(self) -> bool:
         """"""
 
+        if self.connectivity is Connectivity.UNION_FIND:
+            return self.find(self.geometry.left) == self.find(self.geometry.right)
+
+        elif self.connectivity is Connectivity.FLOOD_FILL:
+            return self.is_connected(
+                self.occupied_co[True], self.bb_cols[0], self.bb_cols[self.size - 1]
+            )
+
         whites: BitBoard = self.occupied_co[True]
 
         # check there is a white stone on every column
@@ -206,22 +295,115 @@ class Board:
 
         whites: BitBoard = self.occupied_co[True]
 
-        for f in (
-            self.cell_down,
-            self.cell_right,
-            self.cell_upright,
-            self.cell_up,
-            self.cell_downleft,
-            self.cell_left,
-        ):
-            try:
-                neighbour_cell = f(mask)
-            except BoardShapeError:
-                continue
-            else:
+        for direction in WHITE_DIRECTIONS:
+            shift, movable = self.geometry.shifts[direction]
+            if mask & movable:
+                neighbour_cell = mask << shift if shift > 0 else mask >> -shift
                 if neighbour_cell & whites & ~visited:
                     yield neighbour_cell
 
+    def is_connected(self, stones: BitBoard, edge: BitBoard, opposite_edge: BitBoard) -> bool:
+        """
+        Iterative way of finding if stones connect two opposite edges.
+
+        Grows the set of stones connected to `edge` by dilating it to all neighbours at once, until it reaches
+        `opposite_edge` or stops growing.
+        """
+
+        connected: BitBoard = stones & edge
+        while connected:
+            if connected & opposite_edge:
+                return True
+
+            grown = self.dilate(connected) & stones
+            if grown == connected:
+                return False
+
+            connected = grown
+
+        return False
+
+    def dilate(self, mask: BitBoard) -> BitBoard:
+        """
+        Extend the mask by all neighbouring cells, in one pass of whole-board shifts.
+        """
+
+        size = self.size
+        not_left = mask & self.geometry.not_left
+        not_right = mask & self.geometry.not_right
+
+        return (
+            mask
+            | not_right << 1
+            | not_left >> 1
+            | mask << size
+            | mask >> size
+            | not_left << (size - 1)
+            | not_right >> (size - 1)
+        ) & self.geometry.full
+
+    def find(self, node: int) -> int:
+        """
+        Root of the set the node belongs to.
+
+        No path compression, so that every union can be undone, union by rank keeps the trees shallow anyway.
+        """
+
+        parent = self.parent
+        while parent[node] != node:
+            node = parent[node]
+        return node
+
+    def union(self, a: int, b: int) -> Optional[Union]:
+        """
+        Merge sets of the two nodes, return what was done or None if they were already in the same set.
+        """
+
+        root_a = self.find(a)
+        root_b = self.find(b)
+        if root_a == root_b:
+            return None
+
+        if self.rank[root_a] > self.rank[root_b]:
+            root_a, root_b = root_b, root_a
+
+        self.parent[root_a] = root_b
+        incremented = self.rank[root_a] == self.rank[root_b]
+        if incremented:
+            self.rank[root_b] += 1
+
+        return root_a, root_b, incremented
+
+    def connect(self, cell: int, color: bool) -> None:
+        """
+        Merge a newly placed stone with neighbouring stones and edges of its color.
+        """
+
+        geometry = self.geometry
+        stones = self.occupied_co[color]
+        edges = (geometry.left, geometry.right) if color else (geometry.top, geometry.bottom)
+
+        unions = []
+        for neighbour in geometry.neighbour_cells[cell]:
+            if neighbour in edges or (
+                neighbour < geometry.n and stones & (1 << neighbour)
+            ):
+                union = self.union(cell, neighbour)
+                if union:
+                    unions.append(union)
+
+        self.union_stack.append(unions)
+
+    def disconnect(self) -> None:
+        """
+        Undo unions done by the last move.
+        """
+
+        for root_a, root_b, incremented in reversed(self.union_stack.pop()):
+            self.parent[root_a] = root_a
+            if incremented:
+                self.rank[root_b] -= 1
+
     def cell_right(self, mask: BitBoard) -> BitBoard:
         """"""
 
@@ -278,22 +460,58 @@ class Board:
     def push_coord(self, coord: str) -> None:
         """"""
 
-        self.push(FakeMove.from_coord(coord, self.size))
+        self.push(FakeMove.from_coord(len(self.move_stack), coord))
 
     def push(self, move: FakeMove) -> None:
         """"""
 
-        mask = move.get_mask(self.size)
+        if move.x == -1:
+            self.push_pass(move)
+            return
+
+        cell = move.x + move.y * self.size
+        mask = 1 << cell
         self.occupied_co[self.turn] |= mask
         self.unoccupied ^= mask
+        self.toggle_hash(cell, self.turn)
+
+        if self.connectivity is Connectivity.UNION_FIND:
+            self.connect(cell, self.turn)
 
         self.move_stack.append(move)
 
         self.turn = not self.turn
 
-    def pop(self) -> None:
+    def push_pass(self, move: FakeMove) -> None:
         """"""
 
-        self.occupied_co[not self.turn] ^= self.move_stack.pop().get_mask(self.size)
+        if self.connectivity is Connectivity.UNION_FIND:
+            self.union_stack.append([])
+
+        self.move_stack.append(move)
+
+        self.turn = not self.turn
+
+    def pop(self) -> FakeMove:
+        """"""
+
+        move = self.move_stack.pop()
+        if move.x == -1:
+            if self.connectivity is Connectivity.UNION_FIND:
+                self.union_stack.pop()
+
+            self.turn = not self.turn
+            return move
+
+        cell = move.x + move.y * self.size
+        mask = 1 << cell
+        self.occupied_co[not self.turn] ^= mask
+        self.unoccupied |= mask
+        self.toggle_hash(cell, not self.turn)
+
+        if self.connectivity is Connectivity.UNION_FIND:
+            self.disconnect()
 
         self.turn = not self.turn
+
+        return move
@@ -1,61 +1,294 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import asyncio
+import sys
+from array import array
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
 from functools import wraps
-from typing import Awaitable, Callable, List, TYPE_CHECKING, Tuple
-
-from cache.lru import LRU
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, TYPE_CHECKING, Tuple
 
+from hex_forest.common.openings import FOLDING, Suggestion, position_hashes
+from hex_forest.common.zobrist import Symmetry, get_zobrist_keys
 from hex_forest.constants import MAX_ARCHIVE_RECORD_LENGTH
 
 if TYPE_CHECKING:
-    from hex_forest.models import ArchiveRecord
     from hex_forest.models.move import FakeMove
 
+Key = Tuple[int, int]
+"""Board size and Zobrist hash of the position."""
+
+
+def measure_entry_overhead() -> int:
+    """
+    Bytes an entry takes in an ordered dict besides its key and value, on the running interpreter.
+
+    The table of a dict grows in steps, so the cost per entry is averaged over sizes across one step of growth.
+    """
+
+    empty = sys.getsizeof(OrderedDict())
+    sizes = [int(2 ** (12 + i / 8)) for i in range(8)]
+    return round(sum((sys.getsizeof(OrderedDict.fromkeys(range(n))) - empty) / n for n in sizes) / len(sizes))
+
+
+ENTRY_OVERHEAD: int = measure_entry_overhead()
+"""Bytes taken by an entry of the ordered dict itself besides its key and value, measured at import."""
+
+STAMP_BYTES: int = sys.getsizeof((None, None)) + sys.getsizeof(0.0)
+"""Bytes taken by the tuple pairing a value with the time it was stored, and by the time."""
+
+
+def prefix_keys(moves: Sequence[FakeMove], size: int) -> List[Key]:
+    """
+    Keys of the empty board and of every position the moves go through, up to `MAX_ARCHIVE_RECORD_LENGTH` stones, each
+    in every orientation of `hex_forest.common.openings.FOLDING`.
+    """
+
+    zobrist_keys = get_zobrist_keys(size)
+    hashes = [0] * len(FOLDING)
+    keys = [(size, 0)]
+    for move in moves[:MAX_ARCHIVE_RECORD_LENGTH]:
+        if move.x == -1:
+            continue
+
+        cell = move.x + move.y * size
+        for i, symmetry in enumerate(FOLDING):
+            hashes[i] ^= zobrist_keys[symmetry][move.color][cell]
+            keys.append((size, hashes[i]))
+    return keys
+
+
+def pack(suggestions: Sequence[Suggestion]) -> array:
+    """
+    Suggestions as one flat array of 4-byte ints, instead of a list of objects.
+    """
+
+    return array("i", [value for suggestion in suggestions for value in suggestion])
+
+
+def unpack(packed: array) -> List[Suggestion]:
+    """"""
+
+    return [tuple(packed[i : i + 4]) for i in range(0, len(packed), 4)]
+
+
+def entry_bytes(key: Key, packed: array) -> int:
+    """
+    Memory taken by a cached entry, the board size is a small int shared by all keys.
+    """
+
+    return ENTRY_OVERHEAD + STAMP_BYTES + sys.getsizeof(key) + sys.getsizeof(key[1]) + sys.getsizeof(packed)
+
+
+@dataclass
+class CacheStats:
+    """
+    Counters of one board size.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    entries: int = 0
+    bytes: int = 0
+
 
 class ArchiveRecordCache:
     """
-    Cache async function results that take exactly one argument.
+    Cache async function results that take moves and the board size, per position the moves lead to.
+
+    Positions are keyed by their hash, so that any move order of the same stones shares an entry and a finished game
+    invalidates exactly the positions it went through. Concurrent calls for a position that is not cached wait for
+    the same single call of the function.
+
+    Results are stored packed and the least recently used ones are evicted once they take more than `max_bytes`.
+
+    `invalidate` only reaches the cache of the calling process, games finished in the websocket server reach the
+    caches of HTTP workers by entries expiring `ttl` seconds after they were stored.
     """
 
-    def __init__(self, maxsize: int = 128):
+    def __init__(self, max_bytes: int = 2**24, ttl: Optional[float] = None):
         """
-        :param maxsize: Use maxsize as None for unlimited size cache
+        :param max_bytes: memory the entries may take in total, as counted by `entry_bytes`
+        :param ttl: seconds an entry is served for, None to keep it until evicted or invalidated
         """
 
-        self.maxsize: int = maxsize
-        self.lru: LRU = LRU(maxsize=maxsize)
+        self.max_bytes: int = max_bytes
+        self.ttl: Optional[float] = ttl
+        self.entries: OrderedDict[Key, Tuple[array, float]] = OrderedDict()
+        """Packed suggestions and the time they were stored, least recently used first."""
+
+        self.bytes: int = 0
+        self.stats: Dict[int, CacheStats] = {}
+        self.loading: Dict[Key, asyncio.Future] = {}
+        """
+        Calls in flight, removed from here when the position is invalidated so that its result is not cached.
+
+        Waiting calls get the result of the leading one, or None if it was cancelled so that they make the call
+        themselves instead of being cancelled with it.
+        """
 
         self.on: bool = True
 
+    @staticmethod
+    def key(moves: Sequence[FakeMove], size: int) -> Key:
+        """"""
+
+        return size, position_hashes(moves, size)[FOLDING.index(Symmetry.IDENTITY)]
+
+    def _stats(self, size: int) -> CacheStats:
+        stats = self.stats.get(size)
+        if stats is None:
+            stats = self.stats[size] = CacheStats()
+        return stats
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and monotonic() - stored_at > self.ttl
+
+    def has(self, key: Key) -> bool:
+        """
+        Is the position cached and not expired, without counting it as a hit or a miss.
+        """
+
+        entry = self.entries.get(key)
+        return entry is not None and not self._expired(entry[1])
+
+    def get(self, key: Key) -> Optional[List[Suggestion]]:
+        """
+        Cached suggestions of the position, counted as a hit or a miss.
+        """
+
+        entry = self.entries.get(key)
+        stats = self._stats(key[0])
+        if entry is not None and self._expired(entry[1]):
+            self._drop(key)
+            stats.expirations += 1
+            entry = None
+
+        if entry is None:
+            stats.misses += 1
+            return None
+
+        stats.hits += 1
+        self.entries.move_to_end(key)
+        return unpack(entry[0])
+
+    def put(self, key: Key, suggestions: Sequence[Suggestion]) -> None:
+        """
+        Store the suggestions and evict the least recently used entries over the budget.
+        """
+
+        self._drop(key)
+        packed = pack(suggestions)
+        size = entry_bytes(key, packed)
+        if size > self.max_bytes:
+            return
+
+        self.entries[key] = (packed, monotonic())
+        self.bytes += size
+        stats = self._stats(key[0])
+        stats.entries += 1
+        stats.bytes += size
+
+        while self.bytes > self.max_bytes:
+            evicted = next(iter(self.entries))
+            self._drop(evicted)
+            self._stats(evicted[0]).evictions += 1
+
+    def _drop(self, key: Key) -> bool:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+
+        size = entry_bytes(key, entry[0])
+        self.bytes -= size
+        stats = self._stats(key[0])
+        stats.entries -= 1
+        stats.bytes -= size
+        return True
+
     def __call__(
         self,
-        func: Callable[[Tuple[FakeMove, ...], int], Awaitable[List[ArchiveRecord]]],
+        func: Callable[[Tuple[FakeMove, ...], int], Awaitable[List[Suggestion]]],
     ):
         """"""
 
         @wraps(func)
         async def wrapper(
             moves: Tuple[FakeMove, ...], size: int
-        ) -> List[ArchiveRecord]:
+        ) -> List[Suggestion]:
             if not self.on or len(moves) > MAX_ARCHIVE_RECORD_LENGTH:
                 return await func(moves, size)
 
-            key = (moves, size)
+            key = self.key(moves, size)
 
-            if key in self.lru:
-                return self.lru[key]
+            while True:
+                suggestions = self.get(key)
+                if suggestions is not None:
+                    return suggestions
+
+                loading = self.loading.get(key)
+                if loading is None:
+                    break
+
+                # None if the leading call was cancelled, then the next waiter makes the call itself
+                suggestions = await asyncio.shield(loading)
+                if suggestions is not None:
+                    return list(suggestions)
+
+            future = self.loading[key] = asyncio.get_running_loop().create_future()
+            try:
+                suggestions = await func(moves, size)
+            except asyncio.CancelledError:
+                future.set_result(None)
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                future.exception()  # retrieved, even if nobody else is waiting
+                raise
             else:
-                self.lru[key] = await func(*key)
-                return self.lru[key]
+                if self.loading.get(key) is future:
+                    self.put(key, suggestions)
+                future.set_result(suggestions)
+                return suggestions
+            finally:
+                if self.loading.get(key) is future:
+                    del self.loading[key]
 
         return wrapper
 
-    def invalidate(self, moves: Tuple[FakeMove, ...], size: int) -> None:
-        key = (moves, size)
+    def invalidate(self, moves: Sequence[FakeMove], size: int) -> None:
+        """
+        Drop every position the moves go through.
+        """
 
-        if key in self.lru:
-            del self.lru[key]
+        for key in prefix_keys(moves, size):
+            self._drop(key)
+            self.loading.pop(key, None)
 
     def clear(self) -> None:
-        self.lru = LRU(maxsize=self.maxsize)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.stats = {
+            size: CacheStats(
+                hits=stats.hits, misses=stats.misses, evictions=stats.evictions, expirations=stats.expirations
+            )
+            for size, stats in self.stats.items()
+        }
+        self.loading = {}
+
+    def report(self) -> Dict[Any, Any]:
+        """
+        Counters per board size and memory taken by all entries.
+        """
+
+        return {
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "bytes": self.bytes,
+            "entries": len(self.entries),
+            "sizes": {size: asdict(stats) for size, stats in sorted(self.stats.items())},
+        }
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import asyncio
+import traceback
+from time import monotonic
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from hex_forest.common.cache import ArchiveRecordCache, Key
+from hex_forest.common.openings import Suggestion
+from hex_forest.models.move import FakeMove
+
+PAUSE_SECONDS: float = 0.01
+"""Break after every warmed position, so that requests are served in between and do not wait for the warmer."""
+
+Suggest = Callable[[Tuple[FakeMove, ...], int], Awaitable[List[Suggestion]]]
+
+
+class CacheWarmer:
+    """
+    Fills an archive cache with the most played positions, walking the opening tree breadth-first from the empty board.
+
+    Every level is visited in the order of the number of games that reached its positions, across board sizes, so
+    that a time budget cuts off the least visited positions first. Positions are warmed one at a time.
+    """
+
+    def __init__(self, cache: ArchiveRecordCache, suggest: Suggest) -> None:
+        """
+        :param suggest: function cached by the cache, read once per position
+        """
+
+        self.cache = cache
+        self.suggest = suggest
+        self.report: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, sizes: Sequence[int], depth: int, seconds: float, again: bool = False) -> None:
+        """
+        Warm in the running event loop, from the first call on or again if asked to.
+
+        :param again: cancel the warming in progress if any and start from the empty board
+        """
+
+        if self._task is not None:
+            if not again:
+                return
+            self._task.cancel()
+
+        self._task = asyncio.create_task(self._warm(sizes, depth, seconds))
+
+    async def _warm(self, sizes: Sequence[int], depth: int, seconds: float) -> None:
+        """"""
+
+        try:
+            await self.warm(sizes, depth, seconds)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            traceback.print_exc()
+
+    async def warm(self, sizes: Sequence[int], depth: int, seconds: float) -> Dict[str, float]:
+        """
+        :param depth: number of moves of the deepest warmed positions
+        :param seconds: time budget, the warming stops after the position in progress once it is spent
+        :returns: number of warmed positions, of them ones that were cached already, and seconds taken
+        """
+
+        start = monotonic()
+        warmed = 0
+        cached = 0
+        seen: Set[Key] = set()
+
+        # number of games reaching each position of the level, its moves and the board size
+        level: List[Tuple[int, Tuple[FakeMove, ...], int]] = [(0, (), size) for size in sizes]
+
+        for ply in range(depth + 1):
+            next_level = []
+            for _, moves, size in sorted(level, key=lambda position: -position[0]):
+                if monotonic() - start > seconds:
+                    break
+
+                key = self.cache.key(moves, size)
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                cached += self.cache.has(key)
+                suggestions = await self.suggest(moves, size)
+                warmed += 1
+                await asyncio.sleep(PAUSE_SECONDS)
+
+                if ply < depth:
+                    next_level.extend(
+                        (number, moves + (FakeMove(len(moves), x, y),), size)
+                        for number, _, x, y in suggestions
+                    )
+            level = next_level
+            if monotonic() - start > seconds:
+                break
+
+        self.report = {"positions": warmed, "cached": cached, "seconds": monotonic() - start}
+        print(
+            f"archive cache warmed with {warmed} positions up to {depth} moves in {self.report['seconds']:.1f} "
+            f"seconds, {cached} of them cached already"
+        )
+        return self.report
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from functools import lru_cache
 from itertools import groupby
-from typing import Tuple
+from typing import NamedTuple, Tuple
 
 
 class Cell:
@@ -100,3 +103,46 @@ class Cell:
         """
 
         return y, x
+
+
+class CellGeometry(NamedTuple):
+    """
+    Immutable position of a cell on the rendered board, shared by every render of the same board size.
+    """
+
+    x: int
+    y: int
+    id: str
+    points: str
+    cx: float
+    cy: float
+
+    @classmethod
+    def create(cls, x: int, y: int) -> CellGeometry:
+        return cls(x, y, Cell.get_id(x, y), Cell.generate_points(y, x), Cell.stone_x(y, x), Cell.stone_y(y))
+
+    def render(self, analysis: bool) -> str:
+        """"""
+
+        onclick = f"putStone('{self.id}', null, false);" if analysis else f"boardClick('{self.id}');"
+        return f'<polygon id="{self.id}" points="{self.points}" class="cell" cx="{self.cx}" cy="{self.cy}" ' \
+               f'onmouseout="boardUnhover(\'{self.id}\')" onmouseover="boardHover(\'{self.id}\')" ' \
+               f'onclick="{onclick}" oncontextmenu="return putStone(\'{self.id}\', null, true);"></polygon>'
+
+
+@lru_cache(maxsize=None)
+def get_cell_rows(size: int) -> Tuple[Tuple[CellGeometry, ...], ...]:
+    """
+    Geometry of all cells on the board, row by row, computed once per board size.
+    """
+
+    return tuple(tuple(CellGeometry.create(x, y) for x in range(size)) for y in range(size))
+
+
+@lru_cache(maxsize=None)
+def render_cells(size: int, analysis: bool) -> str:
+    """
+    SVG fragment with all empty cells of the board, rendered once per board size and mode.
+    """
+
+    return "".join(cell.render(analysis) for row in get_cell_rows(size) for cell in row)
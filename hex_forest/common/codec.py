@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Binary move sequence, one cell index `x + y * size` per move, in order of play.
+
+Boards up to 15x15 take one byte per move, larger boards take two bytes in little-endian order.
+The highest value of the width is reserved for a pass, which also encodes a gap in move indices, so that a sequence
+starting with white is a pass followed by the white move.
+"""
+from __future__ import annotations
+
+import sys
+from array import array
+from base64 import b64decode, urlsafe_b64encode
+from typing import Iterable, List, TYPE_CHECKING, Tuple
+
+from hex_forest.common import BitBoard
+
+if TYPE_CHECKING:
+    from hex_forest.models.move import FakeMove
+
+Packed = bytes
+"""Move sequence encoded by `encode_moves`."""
+
+
+class CodecError(ValueError):
+    """
+    Data is not a move sequence of the board size.
+    """
+
+
+def typecode(size: int) -> str:
+    """
+    Array typecode of a single move on the board of given size.
+    """
+
+    return "B" if size**2 < 0xFF else "H"
+
+
+def pass_code(size: int) -> int:
+    """
+    Value reserved for a pass on the board of given size.
+    """
+
+    return 0xFF if size**2 < 0xFF else 0xFFFF
+
+
+def encode_moves(moves: Iterable[FakeMove], size: int) -> Packed:
+    """"""
+
+    pass_ = pass_code(size)
+    cells = array(typecode(size))
+    for move in moves:
+        while len(cells) < move.index:
+            cells.append(pass_)
+        cells.append(pass_ if move.x == -1 else move.x + move.y * size)
+
+    if sys.byteorder == "big":
+        cells.byteswap()
+    return cells.tobytes()
+
+
+def decode_cells(data: Packed, size: int) -> memoryview:
+    """
+    View on cell indices of the sequence, without copying it on little-endian machines.
+    """
+
+    if typecode(size) == "H" and len(data) % 2:
+        raise CodecError(f"odd number of bytes for a board of size {size}")
+
+    if sys.byteorder == "big" and typecode(size) == "H":
+        cells = array("H", data)
+        cells.byteswap()
+        return memoryview(cells)
+
+    return memoryview(data).cast(typecode(size))
+
+
+def decode_moves(data: Packed, size: int) -> List[FakeMove]:
+    """"""
+
+    # models use the archive cache which is keyed by this codec, so cannot import models on module level
+    from hex_forest.models.move import FakeMove
+
+    pass_ = pass_code(size)
+    cells = decode_cells(data, size)
+    if any(cell >= size**2 and cell != pass_ for cell in cells):
+        raise CodecError(f"cell out of the board of size {size}")
+
+    return [
+        FakeMove(i, -1, -1) if cell == pass_ else FakeMove(i, cell % size, cell // size)
+        for i, cell in enumerate(cells)
+    ]
+
+
+def decode_bitboards(data: Packed, size: int) -> Tuple[BitBoard, BitBoard]:
+    """
+    Black and white stones of the position at the end of the sequence.
+    """
+
+    pass_ = pass_code(size)
+    cells = decode_cells(data, size)
+
+    blacks: BitBoard = 0
+    whites: BitBoard = 0
+    for cell in cells[::2]:
+        if cell != pass_:
+            blacks |= 1 << cell
+    for cell in cells[1::2]:
+        if cell != pass_:
+            whites |= 1 << cell
+
+    return blacks, whites
+
+
+def to_url(data: Packed) -> str:
+    """"""
+
+    return urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def from_url(text: str) -> Packed:
+    """"""
+
+    try:
+        return b64decode(text + "=" * (-len(text) % 4), altchars=b"-_", validate=True)
+    except ValueError as e:
+        raise CodecError(f"not base64: {e}") from e
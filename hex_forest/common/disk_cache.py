@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Archive suggestions of canonical positions in a local SQLite file, so that a restarted server starts with them.
+
+Every process connects on its first use, so that HTTP workers forked after `open` do not share a connection. The
+file is stamped with the archive version it was filled from, and emptied by the first process that opens it with a
+different one.
+
+A row is stamped with the time its suggestions were read from the database. It expires after `ttl`, and is not
+written at all if the position was invalidated after that time, so that a read racing with a finished game of another
+process cannot store the position without the game.
+
+SQLite calls run on a single thread per process, so that waiting for a write of another process never blocks the
+event loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+import time
+import traceback
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, TypeVar
+
+from hex_forest.common.cache import Key, pack, unpack
+from hex_forest.common.openings import Suggestion, to_signed
+
+FORMAT: int = 2
+"""Version of the layout of the file and of the values, part of the archive version."""
+
+TIMEOUT: float = 1.0
+"""Seconds to wait for a write of another process, after which the cache is skipped for the call."""
+
+T = TypeVar("T")
+
+
+class DiskCache:
+    """
+    Canonical suggestions per board size and canonical position hash, see `hex_forest.common.openings.fold`.
+    """
+
+    def __init__(self) -> None:
+        self.path: Optional[str] = None
+        self.version: Optional[str] = None
+        self.ttl: float = 0.0
+        self.connection: Optional[sqlite3.Connection] = None
+        self.pid: Optional[int] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.executor_pid: Optional[int] = None
+
+    def open(self, path: Optional[str], version: str, ttl: float) -> None:
+        """
+        :param path: file of the cache, None to not use it
+        :param version: archive version, entries of any other one are discarded
+        :param ttl: seconds an entry is served for, since its suggestions were read from the database
+        """
+
+        self.path = path
+        self.version = f"{FORMAT}:{version}"
+        self.ttl = ttl
+        self.connection = None
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self.connection is not None and self.pid == os.getpid():
+            return self.connection
+
+        self.connection = None
+        try:
+            connection = sqlite3.connect(self.path, timeout=TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+            if row is None or row[0] != self.version:
+                # the layout may differ as well
+                connection.execute("DROP TABLE IF EXISTS suggestion")
+                connection.execute("DROP TABLE IF EXISTS invalidation")
+                connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.version,))
+                print(f"archive disk cache {self.path} emptied for version {self.version}")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS suggestion ("
+                "board_size INTEGER NOT NULL, position_hash INTEGER NOT NULL, suggestions BLOB NOT NULL, "
+                "stored_at REAL NOT NULL, PRIMARY KEY (board_size, position_hash)) WITHOUT ROWID"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS invalidation ("
+                "board_size INTEGER NOT NULL, position_hash INTEGER NOT NULL, invalidated_at REAL NOT NULL, "
+                "PRIMARY KEY (board_size, position_hash)) WITHOUT ROWID"
+            )
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            traceback.print_exc()
+            return None
+
+        self.connection = connection
+        self.pid = os.getpid()
+        return connection
+
+    async def _run(self, func: Callable[..., Optional[T]], *args: Any) -> Optional[T]:
+        """
+        Call on the thread of the process, which holds its connection.
+        """
+
+        if self.path is None:
+            return None
+
+        # threads of the parent do not exist in a forked worker
+        if self.executor is None or self.executor_pid != os.getpid():
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-cache")
+            self.executor_pid = os.getpid()
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def get(self, key: Key) -> Optional[List[Suggestion]]:
+        """"""
+
+        return await self._run(self._get, key)
+
+    async def put(self, key: Key, suggestions: List[Suggestion], read_at: float) -> None:
+        """
+        :param read_at: `time.time()` taken before the suggestions were read from the database
+        """
+
+        await self._run(self._put, key, suggestions, read_at)
+
+    async def invalidate(self, keys: Iterable[Key]) -> None:
+        """
+        Drop the positions, keyed by any of their hashes as only the canonical one is stored.
+        """
+
+        await self._run(self._invalidate, list(keys))
+
+    def _get(self, key: Key) -> Optional[List[Suggestion]]:
+        connection = self._connect()
+        if connection is None:
+            return None
+
+        size, position_hash = key
+        try:
+            row = connection.execute(
+                "SELECT suggestions, stored_at FROM suggestion WHERE board_size = ? AND position_hash = ?",
+                (size, to_signed(position_hash)),
+            ).fetchone()
+        except sqlite3.Error:
+            traceback.print_exc()
+            return None
+
+        # an expired row is replaced by the put that follows the miss
+        if row is None or row[1] < time.time() - self.ttl:
+            return None
+
+        packed = array("i")
+        packed.frombytes(row[0])
+        return unpack(packed)
+
+    def _put(self, key: Key, suggestions: List[Suggestion], read_at: float) -> None:
+        if read_at < time.time() - self.ttl:
+            return
+
+        connection = self._connect()
+        if connection is None:
+            return
+
+        size, position_hash = key
+        position_hash = to_signed(position_hash)
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO suggestion SELECT ?, ?, ?, ? WHERE NOT EXISTS ("
+                "SELECT 1 FROM invalidation WHERE board_size = ? AND position_hash = ? AND invalidated_at >= ?)",
+                (size, position_hash, pack(suggestions).tobytes(), read_at, size, position_hash, read_at),
+            )
+        except sqlite3.Error:
+            traceback.print_exc()
+
+    def _invalidate(self, keys: List[Key]) -> None:
+        connection = self._connect()
+        if connection is None:
+            return
+
+        now = time.time()
+        rows = [(size, to_signed(position_hash)) for size, position_hash in keys]
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany("DELETE FROM suggestion WHERE board_size = ? AND position_hash = ?", rows)
+            connection.executemany(
+                "INSERT OR REPLACE INTO invalidation VALUES (?, ?, ?)", [row + (now,) for row in rows]
+            )
+            # a put of a read older than the ttl is skipped anyway
+            connection.execute("DELETE FROM invalidation WHERE invalidated_at < ?", (now - self.ttl,))
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            traceback.print_exc()
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Tuple
+
+from hex_forest.common import BitBoard
+
+DIRECTIONS: Tuple[str, ...] = ("right", "left", "down", "up", "downleft", "upright")
+"""Six neighbours of a hex cell, in the order of `Board.cell_*` methods."""
+
+
+@dataclass(frozen=True)
+class BoardGeometry:
+    """
+    Everything about a board that depends on its size only.
+
+    Built once per size by `get_geometry` and shared read-only by every `Board` of that size.
+    Cell index is `x + y * size`, same as bit index in a `BitBoard`.
+    """
+
+    size: int
+    n: int
+    """Number of cells."""
+
+    rows: Tuple[BitBoard, ...]
+    cols: Tuple[BitBoard, ...]
+    full: BitBoard
+    not_left: BitBoard
+    """All cells but the first column, the ones that can be shifted left."""
+    not_right: BitBoard
+    """All cells but the last column, the ones that can be shifted right."""
+
+    shifts: Dict[str, Tuple[int, BitBoard]]
+    """Per direction the bit shift (positive is left shift) and the mask of cells that have a neighbour that way."""
+
+    neighbour_masks: Tuple[BitBoard, ...]
+    """Per cell the mask of all adjacent cells."""
+
+    neighbour_cells: Tuple[Tuple[int, ...], ...]
+    """Per cell indices of adjacent cells, followed by the virtual edge nodes the cell touches."""
+
+    top: int
+    bottom: int
+    left: int
+    right: int
+    """Virtual edge nodes, numbered right after the last cell."""
+
+    rotation: Tuple[int, ...]
+    """Per cell the index of the cell after 180 degree rotation, see `Cell.reverse`."""
+
+    swap: Tuple[int, ...]
+    """Per cell the index of the cell mirrored across the long diagonal, see `Cell.swap`."""
+
+    @property
+    def bottom_row(self) -> BitBoard:
+        return self.rows[self.size - 1]
+
+    @property
+    def right_col(self) -> BitBoard:
+        return self.cols[self.size - 1]
+
+
+@lru_cache(maxsize=None)
+def get_geometry(size: int) -> BoardGeometry:
+    """
+    Get geometry of the board of given size, computed on first call only.
+    """
+
+    n = size**2
+    rows = tuple(((1 << size) - 1) << (row * size) for row in range(size))
+    cols = tuple(sum(1 << (col + row * size) for row in range(size)) for col in range(size))
+    full = (1 << n) - 1
+    not_left = full ^ cols[0]
+    not_right = full ^ cols[size - 1]
+    not_top = full ^ rows[0]
+    not_bottom = full ^ rows[size - 1]
+
+    shifts = {
+        "right": (1, not_right),
+        "left": (-1, not_left),
+        "down": (size, not_bottom),
+        "up": (-size, not_top),
+        "downleft": (size - 1, not_bottom & not_left),
+        "upright": (-(size - 1), not_top & not_right),
+    }
+
+    top, bottom, left, right = n, n + 1, n + 2, n + 3
+
+    neighbour_masks = []
+    neighbour_cells = []
+    for cell in range(n):
+        mask = 1 << cell
+        cells = []
+        for shift, movable in shifts.values():
+            if mask & movable:
+                cells.append(cell + shift)
+        neighbour_masks.append(sum(1 << c for c in cells))
+
+        x, y = cell % size, cell // size
+        if y == 0:
+            cells.append(top)
+        if y == size - 1:
+            cells.append(bottom)
+        if x == 0:
+            cells.append(left)
+        if x == size - 1:
+            cells.append(right)
+        neighbour_cells.append(tuple(cells))
+
+    return BoardGeometry(
+        size=size,
+        n=n,
+        rows=rows,
+        cols=cols,
+        full=full,
+        not_left=not_left,
+        not_right=not_right,
+        shifts=shifts,
+        neighbour_masks=tuple(neighbour_masks),
+        neighbour_cells=tuple(neighbour_cells),
+        top=top,
+        bottom=bottom,
+        left=left,
+        right=right,
+        rotation=tuple(n - 1 - cell for cell in range(n)),
+        swap=tuple((cell // size) + (cell % size) * size for cell in range(n)),
+    )
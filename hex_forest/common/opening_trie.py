@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import asyncio
+import traceback
+from array import array
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+from tortoise.expressions import Q
+
+from hex_forest.common.openings import (
+    Suggestion,
+    fold,
+    game_positions,
+    next_moves,
+    position_hashes,
+    prefix_positions,
+    top_suggestions,
+)
+from hex_forest.common.zobrist import Symmetry
+
+if TYPE_CHECKING:
+    from hex_forest.models.game import Game
+    from hex_forest.models.move import FakeMove
+
+NO_INDEX: int = -1
+
+INITIAL_SLOTS: int = 1 << 10
+"""Slots of the hash table of an empty trie, doubled whenever it gets half full."""
+
+REFRESH_SECONDS: float = 60.0
+
+REFRESH_MARGIN: timedelta = timedelta(minutes=5)
+"""How long before the latest finish time a game can still be saved, as moves and results are written behind."""
+
+
+class OpeningTrie:
+    """
+    Suggestions of finished games on one board size, kept in memory in flat arrays.
+
+    Nodes are positions folded by `hex_forest.common.openings.FOLDING`, so move orders reaching the same position
+    share a node. Edges are next moves, linked into a list per node, each with the game counts and the node of the
+    position it leads to. Nodes are found by hash through an open addressing table of node indices.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.games: int = 0
+
+        self.node_hash = array("Q")
+        self.node_first_edge = array("i")
+
+        self.edge_next = array("i")
+        """Next edge of the same node or `NO_INDEX`."""
+
+        self.edge_cell = array("H")
+        """The next move in the canonical orientation of the node."""
+
+        self.edge_child = array("i")
+        """Node of the position after the move, `NO_INDEX` if deeper than any suggestion."""
+
+        self.edge_number = array("I")
+        self.edge_black_wins = array("I")
+
+        self.slots = array("i", [NO_INDEX]) * INITIAL_SLOTS
+
+    def find(self, position_hash: int) -> int:
+        """
+        Index of the node of the canonical position hash, or `NO_INDEX`.
+        """
+
+        slots = self.slots
+        mask = len(slots) - 1
+        slot = position_hash & mask
+        while True:
+            node = slots[slot]
+            if node == NO_INDEX or self.node_hash[node] == position_hash:
+                return node
+            slot = (slot + 1) & mask
+
+    def node(self, position_hash: int) -> int:
+        """
+        Index of the node of the canonical position hash, added if missing.
+        """
+
+        node = self.find(position_hash)
+        if node != NO_INDEX:
+            return node
+
+        node = len(self.node_hash)
+        self.node_hash.append(position_hash)
+        self.node_first_edge.append(NO_INDEX)
+
+        if 2 * len(self.node_hash) > len(self.slots):
+            self._resize(2 * len(self.slots))
+        else:
+            self._insert(node)
+        return node
+
+    def _insert(self, node: int) -> None:
+        slots = self.slots
+        mask = len(slots) - 1
+        slot = self.node_hash[node] & mask
+        while slots[slot] != NO_INDEX:
+            slot = (slot + 1) & mask
+        slots[slot] = node
+
+    def _resize(self, n_slots: int) -> None:
+        self.slots = array("i", [NO_INDEX]) * n_slots
+        for node in range(len(self.node_hash)):
+            self._insert(node)
+
+    def edge(self, node: int, cell: int) -> int:
+        """
+        Index of the edge from the node by the move, added if missing.
+        """
+
+        edge = self.node_first_edge[node]
+        while edge != NO_INDEX:
+            if self.edge_cell[edge] == cell:
+                return edge
+            edge = self.edge_next[edge]
+
+        edge = len(self.edge_cell)
+        self.edge_next.append(self.node_first_edge[node])
+        self.edge_cell.append(cell)
+        self.edge_child.append(NO_INDEX)
+        self.edge_number.append(0)
+        self.edge_black_wins.append(0)
+        self.node_first_edge[node] = edge
+        return edge
+
+    def add_game(self, moves: Sequence[FakeMove], black_won: bool) -> None:
+        """"""
+
+        size = self.size
+        previous_edges: List[int] = []
+        for position_hash, symmetries, move in game_positions(moves, size):
+            node = self.node(position_hash)
+            for edge in previous_edges:
+                self.edge_child[edge] = node
+
+            previous_edges = []
+            for x, y in next_moves(move, symmetries, size):
+                edge = self.edge(node, x + y * size)
+                self.edge_number[edge] += 1
+                self.edge_black_wins[edge] += black_won
+                previous_edges.append(edge)
+
+        self.games += 1
+
+    def suggestions(self, moves: Sequence[FakeMove]) -> List[Suggestion]:
+        """
+        Most played next moves from the position, in the orientation of the given moves.
+        """
+
+        return self._suggestions(*fold(position_hashes(moves, self.size)), not moves)
+
+    def review(self, moves: Sequence[FakeMove]) -> List[List[Suggestion]]:
+        """
+        Suggestions of every prefix of the moves, see `hex_forest.common.openings.prefix_positions`.
+        """
+
+        return [
+            self._suggestions(position_hash, symmetries, i == 0)
+            for i, (position_hash, symmetries) in enumerate(prefix_positions(moves, self.size))
+        ]
+
+    def _suggestions(self, position_hash: int, symmetries: Tuple[Symmetry, ...], first_move: bool) -> List[Suggestion]:
+        size = self.size
+        node = self.find(position_hash)
+        if node == NO_INDEX:
+            return []
+
+        suggestions = []
+        edge = self.node_first_edge[node]
+        while edge != NO_INDEX:
+            cell = self.edge_cell[edge]
+            suggestions.append((self.edge_number[edge], self.edge_black_wins[edge], cell % size, cell // size))
+            edge = self.edge_next[edge]
+
+        return top_suggestions(suggestions, symmetries, size, first_move)
+
+    def memory_report(self) -> Dict[str, int]:
+        """
+        Number of games, nodes and edges, and bytes taken by the arrays.
+        """
+
+        arrays = {
+            "node_hash": self.node_hash,
+            "node_first_edge": self.node_first_edge,
+            "edge_next": self.edge_next,
+            "edge_cell": self.edge_cell,
+            "edge_child": self.edge_child,
+            "edge_number": self.edge_number,
+            "edge_black_wins": self.edge_black_wins,
+            "slots": self.slots,
+        }
+        report = {"games": self.games, "nodes": len(self.node_hash), "edges": len(self.edge_cell)}
+        report.update({f"{name}_bytes": len(a) * a.itemsize for name, a in arrays.items()})
+        report["total_bytes"] = sum(len(a) * a.itemsize for a in arrays.values())
+        return report
+
+
+class OpeningTries:
+    """
+    Tries of all board sizes, loaded once from the database and then refreshed with games finished since.
+
+    Games are found by finish time, with a margin for games saved late. Imported games get their import time as finish
+    time, games finished without one are old enough to be found by the initial load.
+    """
+
+    def __init__(self) -> None:
+        self.tries: Dict[int, OpeningTrie] = {}
+        self.loaded: bool = False
+
+        self.finished_at: Optional[datetime] = None
+        """Latest finish time of added games."""
+
+        self.recent: Dict[int, datetime] = {}
+        """Added games finished within `REFRESH_MARGIN` before `finished_at`, that a refresh finds again."""
+
+        self._task: Optional[asyncio.Task] = None
+
+    def add_game(self, game: Game) -> None:
+        """"""
+
+        trie = self.tries.get(game.board_size)
+        if trie is None:
+            trie = self.tries[game.board_size] = OpeningTrie(game.board_size)
+        trie.add_game(game.fake_moves, game.black_won)
+
+        if game.finished_at is not None:
+            self.recent[game.id] = game.finished_at
+            if self.finished_at is None or game.finished_at > self.finished_at:
+                self.finished_at = game.finished_at
+
+    async def load(self, batch_size: int = 1000) -> None:
+        """
+        Add all finished games.
+        """
+
+        from hex_forest.models.game import Game, Status
+
+        last_id = 0
+        while True:
+            games = await Game.filter(status__in=[Status.WHITE_WON, Status.BLACK_WON], id__gt=last_id).order_by(
+                "id"
+            ).limit(batch_size)
+            if not games:
+                break
+
+            for game in games:
+                self.add_game(game)
+            last_id = games[-1].id
+
+        self._forget_old()
+        self.loaded = True
+
+        for size, report in self.memory_report().items():
+            print(f"opening trie {size}x{size}: {report}")
+
+    async def refresh(self) -> None:
+        """
+        Add games finished since the last refresh.
+        """
+
+        from hex_forest.models.game import Game, Status
+
+        finished = (
+            Q(finished_at__gt=self.finished_at - REFRESH_MARGIN) if self.finished_at else Q(finished_at__isnull=False)
+        )
+        games = await Game.filter(
+            finished,
+            status__in=[Status.WHITE_WON, Status.BLACK_WON],
+        ).order_by("id")
+
+        for game in games:
+            if game.id not in self.recent:
+                self.add_game(game)
+
+        self._forget_old()
+
+    def _forget_old(self) -> None:
+        if self.finished_at is not None:
+            since = self.finished_at - REFRESH_MARGIN
+            self.recent = {game_id: finished_at for game_id, finished_at in self.recent.items() if finished_at > since}
+
+    def start_refreshing(self) -> None:
+        """
+        Refresh periodically in the running event loop, from the first call on.
+        """
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_forever())
+
+    async def _refresh_forever(self) -> None:
+        """"""
+
+        while True:
+            await asyncio.sleep(REFRESH_SECONDS)
+            try:
+                await self.refresh()
+            except Exception:
+                traceback.print_exc()
+
+    def suggestions(self, moves: Sequence[FakeMove], size: int) -> List[Suggestion]:
+        """"""
+
+        trie = self.tries.get(size)
+        return trie.suggestions(moves) if trie else []
+
+    def review(self, moves: Sequence[FakeMove], size: int) -> List[List[Suggestion]]:
+        """"""
+
+        trie = self.tries.get(size)
+        return trie.review(moves) if trie else [[] for _ in prefix_positions(moves, size)]
+
+    def memory_report(self) -> Dict[int, Dict[str, int]]:
+        """
+        `OpeningTrie.memory_report` per board size.
+        """
+
+        return {size: trie.memory_report() for size, trie in sorted(self.tries.items())}
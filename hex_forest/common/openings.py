@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Positions of archived games folded by symmetry, shared by every store of archive suggestions.
+
+A suggestion is a next move played from a position, where a position is the set of stones with colors following the
+move index, so that games reaching it by a different move order count together.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Sequence, Tuple
+
+from hex_forest.common.zobrist import Symmetry, get_zobrist_keys
+from hex_forest.constants import MAX_ARCHIVE_RECORD_LENGTH
+
+if TYPE_CHECKING:
+    from hex_forest.models.move import FakeMove
+
+FOLDING: Tuple[Symmetry, ...] = (Symmetry.IDENTITY, Symmetry.ROTATION)
+"""
+Symmetries folded together, same as in the archive query. Swapping colors is not folded, as archived games always
+start with black.
+"""
+
+Suggestion = Tuple[int, int, int, int]
+"""Number of games, black wins, x and y of the next move."""
+
+
+def to_signed(h: int) -> int:
+    """
+    64-bit hash as a value of a signed bigint column.
+    """
+
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+def fold(hashes: Sequence[int]) -> Tuple[int, Tuple[Symmetry, ...]]:
+    """
+    Canonical hash among `FOLDING` and the symmetries that turn the position into the canonical one.
+
+    :param hashes: hash of the position transformed by each symmetry of `FOLDING`
+    """
+
+    canonical = min(hashes)
+    return canonical, tuple(symmetry for symmetry, h in zip(FOLDING, hashes) if h == canonical)
+
+
+def position_hashes(moves: Iterable[FakeMove], size: int) -> List[int]:
+    """
+    Hash of stones of the moves, transformed by each symmetry of `FOLDING`. Passes add no stone.
+    """
+
+    keys = get_zobrist_keys(size)
+    hashes = [0] * len(FOLDING)
+    for move in moves:
+        if move.x == -1:
+            continue
+
+        cell = move.x + move.y * size
+        for i, symmetry in enumerate(FOLDING):
+            hashes[i] ^= keys[symmetry][move.color][cell]
+    return hashes
+
+
+def game_positions(moves: Sequence[FakeMove], size: int) -> Iterator[Tuple[int, Tuple[Symmetry, ...], FakeMove]]:
+    """
+    Folded position before each move of a game that can be suggested, with the move.
+
+    Positions have up to `MAX_ARCHIVE_RECORD_LENGTH` stones and passes are skipped.
+    """
+
+    keys = get_zobrist_keys(size)
+    hashes = [0] * len(FOLDING)
+    for move in moves[: MAX_ARCHIVE_RECORD_LENGTH + 1]:
+        if move.x == -1:
+            continue
+
+        yield (*fold(hashes), move)
+
+        cell = move.x + move.y * size
+        for i, symmetry in enumerate(FOLDING):
+            hashes[i] ^= keys[symmetry][move.color][cell]
+
+
+def prefix_positions(moves: Sequence[FakeMove], size: int) -> Iterator[Tuple[int, Tuple[Symmetry, ...]]]:
+    """
+    Folded position after each prefix of the moves that can have suggestions, from the empty board up to
+    `MAX_ARCHIVE_RECORD_LENGTH` moves. A pass adds no stone, but is a prefix of its own.
+    """
+
+    keys = get_zobrist_keys(size)
+    hashes = [0] * len(FOLDING)
+    yield fold(hashes)
+    for move in moves[:MAX_ARCHIVE_RECORD_LENGTH]:
+        if move.x != -1:
+            cell = move.x + move.y * size
+            for i, symmetry in enumerate(FOLDING):
+                hashes[i] ^= keys[symmetry][move.color][cell]
+
+        yield fold(hashes)
+
+
+def next_moves(move: FakeMove, symmetries: Tuple[Symmetry, ...], size: int) -> List[Tuple[int, int]]:
+    """
+    The move in the canonical orientation of the position it was played from.
+
+    A position that is its own rotation has two canonical orientations and the move is counted in both of them, same
+    as the archive query matches such a game twice.
+    """
+
+    return sorted({symmetry.apply(move.x, move.y, size) for symmetry in symmetries})
+
+
+def top_suggestions(
+    suggestions: Iterable[Suggestion], symmetries: Tuple[Symmetry, ...], size: int, first_move: bool
+) -> List[Suggestion]:
+    """
+    Most played suggestions of a position, turned from the canonical orientation back to the one of the position.
+
+    :param suggestions: all suggestions stored for the canonical position
+    :param symmetries: symmetries that turn the position into the canonical one, as returned by `fold`
+    :param first_move: the position is the empty board
+    """
+
+    # ties ordered by the canonical cell, so that every store shows the same ones
+    ordered = sorted(suggestions, key=lambda suggestion: (-suggestion[0], suggestion[3], suggestion[2]))
+    if first_move:
+        # both orientations of every first move are stored, show each opening once
+        half = size - 1
+        ordered = [
+            (number, black_wins, x, y)
+            for number, black_wins, x, y in ordered
+            if x + y < half or (x + y == half and x <= size // 2)
+        ][:15]
+    else:
+        ordered = ordered[:10]
+
+    # a symmetric position is stored in both orientations already
+    symmetry = symmetries[0] if len(symmetries) == 1 else Symmetry.IDENTITY
+    return [(number, black_wins, *symmetry.apply(x, y, size)) for number, black_wins, x, y in ordered]
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import asyncio
+import traceback
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Sequence, Set
+
+from hex_forest.common.cache import ArchiveRecordCache, Key
+from hex_forest.common.cache_warmer import Suggest
+from hex_forest.common.openings import Suggestion
+from hex_forest.constants import MAX_ARCHIVE_RECORD_LENGTH
+from hex_forest.models.move import FakeMove
+
+DELAY_SECONDS: float = 0.05
+"""Wait before prefetching, so that the response of the position is sent first."""
+
+TRACKED: int = 4096
+"""Prefetched positions remembered to count hits, the oldest are forgotten as not visited."""
+
+
+@dataclass
+class PrefetchStats:
+    """"""
+
+    prefetched: int = 0
+    hits: int = 0
+    """Requests for a prefetched position, each position counted once."""
+
+    cached: int = 0
+    """Positions not prefetched as they were cached or loading already."""
+
+    dropped: int = 0
+    """Positions not prefetched as too many prefetches were running."""
+
+
+class Prefetcher:
+    """
+    Reads the positions after the most played next moves of a requested position into an archive cache, guessing
+    that one of them is requested next.
+
+    Prefetches run in the background with a cap on how many run at once across all requests, positions over the cap
+    are dropped rather than queued.
+    """
+
+    def __init__(self, cache: ArchiveRecordCache, suggest: Suggest, children: int, concurrency: int) -> None:
+        """
+        :param suggest: function cached by the cache
+        :param children: number of next moves to prefetch per position
+        :param concurrency: prefetches running at once at most
+        """
+
+        self.cache = cache
+        self.suggest = suggest
+        self.children = children
+        self.concurrency = concurrency
+        self.stats = PrefetchStats()
+
+        self.running: int = 0
+        self.tasks: Set[asyncio.Task] = set()
+        self.prefetched: OrderedDict[Key, None] = OrderedDict()
+
+    def requested(self, moves: Sequence[FakeMove], size: int) -> None:
+        """
+        Count a hit if the requested position was prefetched.
+        """
+
+        key = self.cache.key(moves, size)
+        if key in self.prefetched:
+            del self.prefetched[key]
+            self.stats.hits += 1
+
+    def prefetch(self, moves: Sequence[FakeMove], size: int, suggestions: List[Suggestion]) -> None:
+        """
+        Prefetch positions after the first suggestions, in the orientation of the moves.
+        """
+
+        if len(moves) >= MAX_ARCHIVE_RECORD_LENGTH:
+            return
+
+        for _, _, x, y in suggestions[: self.children]:
+            child = (*moves, FakeMove(len(moves), x, y))
+            key = self.cache.key(child, size)
+            if self.cache.has(key) or key in self.cache.loading:
+                self.stats.cached += 1
+                continue
+            if self.running >= self.concurrency:
+                self.stats.dropped += 1
+                continue
+
+            self.running += 1
+            self.stats.prefetched += 1
+            self.prefetched[key] = None
+            if len(self.prefetched) > TRACKED:
+                self.prefetched.popitem(last=False)
+
+            # a request for the position while it is still prefetched counts as a hit too
+            task = asyncio.create_task(self._prefetch(child, size))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _prefetch(self, moves: Sequence[FakeMove], size: int) -> None:
+        try:
+            await asyncio.sleep(DELAY_SECONDS)
+            await self.suggest(tuple(moves), size)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self.running -= 1
+
+    def report(self) -> Dict[str, Any]:
+        """"""
+
+        return {
+            **asdict(self.stats),
+            "hit_rate": self.stats.hits / self.stats.prefetched if self.stats.prefetched else 0.0,
+            "running": self.running,
+        }
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from hex_forest.common.openings import Suggestion, fold, position_hashes, top_suggestions
+from hex_forest.common.zobrist import Symmetry
+from hex_forest.constants import MAX_ARCHIVE_RECORD_LENGTH
+
+if TYPE_CHECKING:
+    from hex_forest.models.move import FakeMove
+
+OPENING_PLIES: int = MAX_ARCHIVE_RECORD_LENGTH + 1
+"""Moves of each game kept by the matcher, enough for the longest prefix and its next move."""
+
+NO_CELL: int = -1
+"""Cell value of a pass or of a move after the end of a game."""
+
+
+def opening_cells(moves: Sequence[FakeMove], size: int) -> List[int]:
+    """
+    Cell indices of the first `OPENING_PLIES` moves, padded with `NO_CELL`.
+    """
+
+    cells = [NO_CELL if move.x == -1 else move.x + move.y * size for move in moves[:OPENING_PLIES]]
+    return cells + [NO_CELL] * (OPENING_PLIES - len(cells))
+
+
+class PrefixMatcher:
+    """
+    Finds games of one board size that start with the same stones as a position, all games at once.
+
+    Games are rows of an int16 matrix of cell indices, one column per ply. A game matches a position of `n` stones if
+    every one of its first `n` moves is a stone of the position of the same color, same as in the archive query.
+    """
+
+    def __init__(self, cells: np.ndarray, results: np.ndarray, size: int) -> None:
+        """
+        :param cells: int16 array of shape (games, `OPENING_PLIES`), for example a view on a memory-mapped file
+        :param results: per game 1 if black won otherwise 0
+        """
+
+        self.cells = cells
+        self.results = results
+        self.size = size
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    @classmethod
+    def from_games(cls, games: Iterable[Tuple[Sequence[FakeMove], bool]], size: int) -> PrefixMatcher:
+        """
+        :param games: moves of each game and whether black won it
+        """
+
+        cells = []
+        results = []
+        for moves, black_won in games:
+            cells.append(opening_cells(moves, size))
+            results.append(black_won)
+
+        return cls(
+            np.array(cells, dtype=np.int16).reshape(-1, OPENING_PLIES), np.array(results, dtype=np.int8), size
+        )
+
+    def _stone_tables(self, moves: Sequence[FakeMove], rotated: bool) -> np.ndarray:
+        """
+        Per color a lookup of cell index to whether the position has a stone of that color there.
+
+        The tables have one more entry than cells, always False, which is what `NO_CELL` indexes.
+        """
+
+        n_cells = self.size**2
+        tables = np.zeros((2, n_cells + 1), dtype=bool)
+        for move in moves:
+            if move.x != -1:
+                cell = move.x + move.y * self.size
+                tables[int(move.color), n_cells - 1 - cell if rotated else cell] = True
+        return tables
+
+    def match(self, moves: Sequence[FakeMove], rotated: bool = False) -> np.ndarray:
+        """
+        Indices of games matching the position, or its 180 degree rotation.
+        """
+
+        return self._match(self._stone_tables(moves, rotated), len(moves))
+
+    def _match(self, tables: np.ndarray, n: int) -> np.ndarray:
+        """
+        Each ply narrows down the games still matching, so later plies look only at a few rows.
+        """
+
+        if n == 0:
+            return np.arange(len(self.cells))
+
+        rows = np.flatnonzero(tables[0][self.cells[:, 0]])
+        for ply in range(1, n):
+            rows = rows[tables[ply % 2][self.cells[rows, ply]]]
+        return rows
+
+    def _count(self, tables: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Number of games and black wins per next move of the matching games.
+        """
+
+        n_cells = self.size**2
+        rows = self._match(tables, n)
+        cells = self.cells[rows, n].astype(np.intp)
+        played = cells != NO_CELL
+        rows, cells = rows[played], cells[played]
+
+        return (
+            np.bincount(cells, minlength=n_cells),
+            np.bincount(cells, weights=self.results[rows], minlength=n_cells).astype(np.int64),
+        )
+
+    def suggestions(self, moves: Sequence[FakeMove]) -> List[Suggestion]:
+        """
+        Same as `hex_forest.common.opening_trie.OpeningTrie.suggestions`, counted over the matching games.
+
+        Rotating a position rotates the next moves too, which reverses the order of cell indices.
+        """
+
+        n = len(moves)
+        size = self.size
+        n_cells = size**2
+
+        tables = self._stone_tables(moves, rotated=False)
+        rotated_tables = self._stone_tables(moves, rotated=True)
+
+        number, black_wins = self._count(tables, n)
+        if np.array_equal(tables, rotated_tables):
+            # every game matches both ways and is counted in both orientations, once if the move is its own rotation
+            number = number + number[::-1]
+            black_wins = black_wins + black_wins[::-1]
+            if n_cells % 2:
+                center = n_cells // 2
+                number[center] //= 2
+                black_wins[center] //= 2
+        else:
+            rotated_number, rotated_black_wins = self._count(rotated_tables, n)
+            number = number + rotated_number[::-1]
+            black_wins = black_wins + rotated_black_wins[::-1]
+
+        # `top_suggestions` expects the canonical orientation, for the same order of ties as other stores
+        _, symmetries = fold(position_hashes(moves, size))
+        symmetry = symmetries[0] if len(symmetries) == 1 else Symmetry.IDENTITY
+        suggestions = []
+        for cell in np.flatnonzero(number):
+            x, y = symmetry.apply(int(cell) % size, int(cell) // size, size)
+            suggestions.append((int(number[cell]), int(black_wins[cell]), x, y))
+        return top_suggestions(suggestions, symmetries, size, not moves)
+
+    def review(self, moves: Sequence[FakeMove]) -> List[List[Suggestion]]:
+        """
+        Suggestions of every prefix of the moves, see `hex_forest.common.openings.prefix_positions`.
+        """
+
+        return [self.suggestions(moves[:n]) for n in range(min(len(moves), MAX_ARCHIVE_RECORD_LENGTH) + 1)]
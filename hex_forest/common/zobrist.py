@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from enum import IntEnum
+from functools import lru_cache
+from random import Random
+from typing import Tuple
+
+from hex_forest.common.geometry import get_geometry
+
+ZOBRIST_SEED: int = 0x4E58
+"""Keys have to be the same in every process and after every restart, as hashes are used as persistent keys."""
+
+ZobristKeys = Tuple[Tuple[Tuple[int, ...], Tuple[int, ...]], ...]
+"""Per symmetry, per color, per cell the 64-bit key."""
+
+
+class Symmetry(IntEnum):
+    """
+    Transformations that turn a position into an equivalent one.
+    """
+
+    IDENTITY = 0
+    ROTATION = 1
+    """180 degree rotation, see `Cell.reverse`."""
+
+    SWAP = 2
+    """Mirror across the long diagonal with colors swapped, see `Cell.swap`."""
+
+    ROTATION_SWAP = 3
+
+    @property
+    def swaps_color(self) -> bool:
+        return self in (Symmetry.SWAP, Symmetry.ROTATION_SWAP)
+
+    def apply(self, x: int, y: int, size: int) -> Tuple[int, int]:
+        """
+        Coordinates of the cell after transformation. Applying the same symmetry twice gives back the original cell.
+        """
+
+        if self in (Symmetry.ROTATION, Symmetry.ROTATION_SWAP):
+            x, y = size - x - 1, size - y - 1
+        if self.swaps_color:
+            x, y = y, x
+        return x, y
+
+
+@lru_cache(maxsize=None)
+def get_zobrist_keys(size: int) -> ZobristKeys:
+    """
+    Random keys for every stone on the board of given size, with the same keys permuted by every `Symmetry`.
+
+    Hash of a transformed position is a xor of `keys[symmetry][color][cell]` over stones of the original position.
+    """
+
+    geometry = get_geometry(size)
+    rnd = Random(ZOBRIST_SEED + size)
+    keys = tuple(tuple(rnd.getrandbits(64) for _ in range(geometry.n)) for _ in range(2))
+
+    permuted = []
+    for symmetry in Symmetry:
+        per_color = []
+        for color in (False, True):
+            target_color = not color if symmetry.swaps_color else color
+            per_color.append(
+                tuple(
+                    keys[target_color][
+                        geometry.swap[cell] if symmetry is Symmetry.SWAP
+                        else geometry.rotation[cell] if symmetry is Symmetry.ROTATION
+                        else geometry.swap[geometry.rotation[cell]] if symmetry is Symmetry.ROTATION_SWAP
+                        else cell
+                    ]
+                    for cell in range(geometry.n)
+                )
+            )
+        permuted.append(tuple(per_color))
+
+    return tuple(permuted)
@@ -7,3 +7,6 @@ LG_IMPORT_OWNER_NAME = "lg_"
 ADMIN_NAME = "Arek"
 
 MAX_ARCHIVE_RECORD_LENGTH = 12
+
+BOARD_SIZES = (11, 13, 19)
+"""Board sizes with empty cells pre-rendered at startup."""
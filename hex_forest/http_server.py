@@ -7,6 +7,9 @@ from japronto.request.crequest import Request
 from japronto.response.py import Response
 from jinja2 import Template
 
+from hex_forest.common.cell import render_cells
+from hex_forest.constants import BOARD_SIZES
+from hex_forest.models import queries
 from hex_forest.views import AnalysisView, GameView, LobbyView
 from hex_forest.views.archive_view import ArchiveView
 from hex_forest.views.base_view import BaseView
@@ -46,12 +49,14 @@ class HttpServer(LobbyView, GameView, AnalysisView, ArchiveView):
             ("/static/wasm/eval_worker.js", self.wasm_eval),
             ("/static/wood-grain.png", self.wood_pattern),
             ("/static/loader.gif", self.loader),
+            ("/queries", self.query_report),
         ]
         super().__init__()
 
         self.app = Application()
 
         self.prepare_templates()
+        self.prepare_boards()
         self.prepare_files()
         self.collect_routes()
 
@@ -66,6 +71,12 @@ class HttpServer(LobbyView, GameView, AnalysisView, ArchiveView):
         with open(f"static/game.html") as html_file:
             BaseView._game_template = Template(html_minify(html_file.read()))
 
+    @staticmethod
+    def prepare_boards() -> None:
+        for size in BOARD_SIZES:
+            render_cells(size, analysis=True)
+            render_cells(size, analysis=False)
+
     @staticmethod
     def prepare_files() -> None:
         with open("static/style.css") as html_file:
@@ -99,6 +110,14 @@ class HttpServer(LobbyView, GameView, AnalysisView, ArchiveView):
         for url, handler in self._routes:
             self.app.router.add_route(url, handler)
 
+    @staticmethod
+    async def query_report(request: Request) -> Response:
+        """
+        Timing of the hot queries of this worker.
+        """
+
+        return request.Response(json=queries.report())
+
     # @route("/style.css")
     @staticmethod
     async def styles(request: Request) -> Response:
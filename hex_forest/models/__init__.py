@@ -4,3 +4,4 @@ from hex_forest.models.game import Game
 from hex_forest.models.move import Move
 from hex_forest.models.player import Player
 from hex_forest.models.archive_record import ArchiveRecord
+from hex_forest.models.opening_node import OpeningNode
@@ -2,6 +2,7 @@
 from tortoise import Model, fields
 
 from hex_forest.common.cache import ArchiveRecordCache
+from hex_forest.common.disk_cache import DiskCache
 
 
 class ArchiveRecord(Model):
@@ -14,8 +15,11 @@ class ArchiveRecord(Model):
     x: int = fields.IntField()
     y: int = fields.IntField()
 
-    archive_record_cache: ArchiveRecordCache = ArchiveRecordCache(maxsize=4**8)
-    """Each key equals to ~ 50 bytes, therefore equalling to cached memory in total ~3 MB per board size."""
+    archive_record_cache: ArchiveRecordCache = ArchiveRecordCache()
+    """Suggestions per position, the budget is set from `archive_cache_bytes` of the config by the HTTP server."""
+
+    archive_disk_cache: DiskCache = DiskCache()
+    """Canonical suggestions from the database kept across restarts, opened by the servers if configured."""
 
     @property
     def black_prc(self) -> int:
@@ -3,23 +3,34 @@ from __future__ import annotations
 
 import asyncio
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import IntEnum
 from typing import TYPE_CHECKING, Dict, Optional, List, Iterable
 
 from cache import AsyncLRU
 from tortoise import Model, fields, BaseDBAsyncClient
+from tortoise.exceptions import DoesNotExist
+from tortoise.expressions import Q
+from tortoise.timezone import now
+from tortoise.transactions import in_transaction
 from websockets.legacy.server import WebSocketServerProtocol
 
+from hex_forest.common.cache import prefix_keys
+from hex_forest.common.codec import Packed, decode_moves, encode_moves
 from hex_forest.models.archive_record import ArchiveRecord
 
 if TYPE_CHECKING:
     from hex_forest.models import Move
     from hex_forest.models.move import FakeMove
     from hex_forest.models.player import Player
+    from hex_forest.models.queries import GameRow
     from hex_forest.ws_server import PlayerName
 
 
+ARCHIVE_AFTER: timedelta = timedelta(hours=1)
+"""Time since a game finished after which `Game.archive_finished` compacts it."""
+
+
 class Status(IntEnum):
     PENDING = 0
     IN_PROGRESS = 1
@@ -62,9 +73,17 @@ class Game(Model):
 
     lg_import_id = fields.CharField(max_length=7, unique=True, null=True)
 
+    move_counter: int = fields.IntField(default=0)
+    """Number of moves, written together with every change of `moves`."""
+
+    packed_moves: Optional[Packed] = fields.BinaryField(null=True)
+    """All moves encoded by `hex_forest.common.codec`, written together with every change of `moves`."""
+
+    archived: bool = fields.BooleanField(default=False)
+    """Moves are kept only in `packed_moves`, the move table has no rows of the game."""
+
     moves: fields.ReverseRelation["Move"]
 
-    _move_count_cache: Optional[int] = None
     open_cache = AsyncLRU(1)
     finished_cache = AsyncLRU(1)
 
@@ -95,27 +114,22 @@ class Game(Model):
             except KeyError:
                 pass
 
+        # the move is already counted, as live games record moves before announcing them
         if message["action"] == "move":
-            if await self.move_count == 0:
+            if await self.move_count == 1:
                 msg_json = json.dumps({"action": "showSwap"})
                 try:
                     tasks.append(clients[self.white.name].send(msg_json))
                 except KeyError:
                     pass
 
-            self._move_count_cache += 1
-
         await asyncio.wait(tasks)
 
     @property
     async def move_count(self) -> int:
         """"""
 
-        if self._move_count_cache is None:
-            move_count = await self.moves.all().count()
-            self._move_count_cache = move_count
-
-        return self._move_count_cache
+        return self.move_counter
 
     @property
     async def turn(self) -> bool:
@@ -131,7 +145,25 @@ class Game(Model):
         Get game notation.
         """
 
-        return "".join([move.get_coord() for move in await self.moves])
+        return "".join([move.get_coord() for move in self.fake_moves])
+
+    @property
+    def black_won(self) -> bool:
+        """
+        Did the player with black stones at the start win, which after a swap is the one playing white.
+        """
+
+        return (self.status is Status.BLACK_WON and not self.swapped) or (
+            self.status is Status.WHITE_WON and self.swapped
+        )
+
+    @property
+    def fake_moves(self) -> List[FakeMove]:
+        """
+        Moves decoded from the game row, without querying the move table.
+        """
+
+        return decode_moves(self.packed_moves or b"", self.board_size)
 
     async def save(
         self,
@@ -147,36 +179,79 @@ class Game(Model):
         else:
             asyncio.create_task(Game.invalidate_open_cache())
 
-    async def invalidate_archive_record_cache(self) -> None:
-        moves: List[FakeMove] = [
-            move.fake()
-            for move in await self.moves.filter(
-                index__lt=ArchiveRecord.archive_record_cache.maxlistlength
-            )
-        ]
+    async def invalidate_archive_record_cache(self, moves: Optional[List[FakeMove]] = None) -> None:
+        """
+        Drop cached archive records of every position the game went through.
 
-        if len(moves) > 20:
-            for i in range(ArchiveRecord.archive_record_cache.maxlistlength):
-                ArchiveRecord.archive_record_cache.invalidate(
-                    tuple(moves[: i + 1]), self.board_size
-                )
+        The disk cache is shared by all processes, while the memory cache is only the one of this process, caches of
+        other processes serve the positions until they expire, see `ArchiveRecordCache`.
+
+        :param moves: moves of the game if known, otherwise decoded from the game row
+        """
+
+        moves = self.fake_moves if moves is None else moves
+        ArchiveRecord.archive_record_cache.invalidate(moves, self.board_size)
+        await ArchiveRecord.archive_disk_cache.invalidate(prefix_keys(moves, self.board_size))
 
     @staticmethod
-    @AsyncLRU(128)
-    async def get_by_id(game_id: int) -> Game:
-        game = await Game.get(id=game_id).prefetch_related(
-            "owner", "white", "black", "moves"
-        )
+    async def get_by_id(game_id: int) -> GameRow:
+        """
+        Read fresh on every call, as moves and status of a live game change in the websocket server which cannot
+        invalidate a cache of the HTTP workers. It is a single prepared lookup by primary key.
+
+        :raises DoesNotExist: if there is no game of the id
+        """
+
+        from hex_forest.models.queries import GAME_BY_ID
+
+        game = await GAME_BY_ID.fetch_one(int(game_id))
+        if game is None:
+            raise DoesNotExist(f"game {game_id} does not exist")
         return game
 
+    @staticmethod
+    async def archive_finished(batch_size: int = 1000) -> int:
+        """
+        Compact finished games into `packed_moves` and remove their rows from the move table.
+
+        Games finished less than `ARCHIVE_AFTER` ago are skipped, so that writes still queued by the websocket server
+        cannot add rows to a game that is already archived. Games finished without a finish time are old ones, from
+        before it was recorded, and are archived too.
+
+        :returns: number of archived games
+        """
+
+        from hex_forest.models.move import Move
+
+        archived = 0
+        while True:
+            game_ids = await Game.filter(
+                Q(finished_at__lt=now() - ARCHIVE_AFTER) | Q(finished_at__isnull=True),
+                archived=False,
+                status__in=[Status.WHITE_WON, Status.BLACK_WON],
+            ).limit(batch_size).values_list("id", "board_size")
+            if not game_ids:
+                return archived
+
+            for game_id, board_size in game_ids:
+                async with in_transaction() as connection:
+                    moves = await Move.filter(game_id=game_id).using_db(connection).order_by("index")
+                    await Game.filter(id=game_id).using_db(connection).update(
+                        archived=True,
+                        move_counter=len(moves),
+                        packed_moves=encode_moves([move.fake() for move in moves], board_size),
+                    )
+                    await Move.filter(game_id=game_id).using_db(connection).delete()
+
+            archived += len(game_ids)
+            print(f"archived {archived} games")
+
     @staticmethod
     @open_cache
-    async def get_open() -> List[Game]:
-        return (
-            await Game.filter(status__in=[Status.PENDING, Status.IN_PROGRESS])
-            .order_by("status", "-started_at")
-            .prefetch_related("white", "black")
-        )
+    async def get_open() -> List[GameRow]:
+        from hex_forest.models.queries import OPEN_GAMES
+
+        return await OPEN_GAMES.fetch([Status.PENDING, Status.IN_PROGRESS])
 
     @staticmethod
     async def invalidate_open_cache() -> None:
@@ -184,13 +259,10 @@ class Game(Model):
 
     @staticmethod
     @finished_cache
-    async def get_finished() -> List[Game]:
-        return (
-            await Game.filter(board_size=13, status__in=[Status.BLACK_WON, Status.WHITE_WON])  # TODO: board size
-            .limit(10)
-            .order_by("-started_at")
-            .prefetch_related("white", "black")
-        )
+    async def get_finished() -> List[GameRow]:
+        from hex_forest.models.queries import FINISHED_GAMES
+
+        return await FINISHED_GAMES.fetch(13, [Status.BLACK_WON, Status.WHITE_WON], 10)  # TODO: board size
 
     @staticmethod
     async def invalidate_finished_cache() -> None:
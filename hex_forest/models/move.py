@@ -52,7 +52,7 @@ class Move(Model):
         return FakeMove(index=self.index, x=self.x, y=self.y)
 
     def get_mask(self, size: Optional[int] = None) -> BitBoard:
-        return 1 << ((self.x - 1) + self.y * (size or self.game.board_size))
+        return 1 << (self.x + self.y * (size or self.game.board_size))
 
     def get_coord(self) -> str:
         """"""
@@ -71,7 +71,7 @@ class FakeMove:
         return self.index % 2 != 0
 
     def get_mask(self, size: int) -> BitBoard:
-        return 1 << ((self.x - 1) + self.y * size)
+        return 1 << (self.x + self.y * size)
 
     def __hash__(self):  # TODO: add proper type hint
         return hash((self.index, self.x, self.y))
@@ -88,7 +88,7 @@ class FakeMove:
         groups = groupby(coord, str.isalpha)
         col_str, row_str = ("".join(g[1]) for g in groups)
 
-        return cls(index, ord(col_str) - 97, int(row_str))
+        return cls(index, ord(col_str) - 97, int(row_str) - 1)
 
     @staticmethod
     def mask_from_coord(coord: str, size: int) -> BitBoard:
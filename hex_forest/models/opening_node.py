@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Dict, Iterable, List, Sequence, Tuple
+
+from tortoise import Model, fields
+
+from hex_forest.common.openings import (
+    Suggestion,
+    game_positions,
+    next_moves,
+    prefix_positions,
+    to_signed,
+    top_suggestions,
+)
+from hex_forest.constants import MAX_ARCHIVE_RECORD_LENGTH
+
+if TYPE_CHECKING:
+    from hex_forest.models.move import FakeMove
+
+NodeKey = Tuple[int, int, int]
+"""Position hash and the next move in the canonical orientation."""
+
+SUGGESTIONS: int = 10
+FIRST_MOVE_SUGGESTIONS: int = 30
+"""Nodes read for the empty board, where both orientations of every move are stored."""
+
+
+class OpeningNode(Model):
+    """
+    Next moves played in finished games from a position, with positions folded by
+    `hex_forest.common.openings.FOLDING`.
+
+    Filled incrementally by `add_game`, with positions up to `MAX_ARCHIVE_RECORD_LENGTH` stones.
+    """
+
+    id: int = fields.IntField(pk=True)
+    board_size: int = fields.IntField()
+    position_hash: int = fields.BigIntField()
+    """Canonical hash of the position, see `hex_forest.common.openings.fold`."""
+
+    x: int = fields.IntField()
+    y: int = fields.IntField()
+    """The next move, in the canonical orientation of the position."""
+
+    number: int = fields.IntField(default=0)
+    black_wins: int = fields.IntField(default=0)
+
+    class Meta:
+        table = "opening_node"
+        unique_together = (("board_size", "position_hash", "x", "y"),)
+
+    @staticmethod
+    def game_nodes(moves: Sequence[FakeMove], size: int) -> Counter[NodeKey]:
+        """
+        Nodes a game passes through, each counted once per orientation the next move is seen in.
+        """
+
+        nodes: Counter[NodeKey] = Counter()
+        for position_hash, symmetries, move in game_positions(moves, size):
+            for x, y in next_moves(move, symmetries, size):
+                nodes[(to_signed(position_hash), x, y)] += 1
+
+        return nodes
+
+    @staticmethod
+    async def add_games(games: Iterable[Tuple[Sequence[FakeMove], bool]], size: int) -> None:
+        """
+        Count finished games in the tree.
+
+        :param games: moves of each game and whether black won it
+        """
+
+        number: Counter[NodeKey] = Counter()
+        black_wins: Counter[NodeKey] = Counter()
+        for moves, black_won in games:
+            nodes = OpeningNode.game_nodes(moves, size)
+            number.update(nodes)
+            if black_won:
+                black_wins.update(nodes)
+
+        if not number:
+            return
+
+        from hex_forest.models.queries import ADD_OPENING_NODES
+
+        # rows locked in the same order by every writer, so that concurrent upserts cannot deadlock
+        nodes = sorted(number)
+        await ADD_OPENING_NODES.fetch(
+            size,
+            [position_hash for position_hash, _, _ in nodes],
+            [x for _, x, _ in nodes],
+            [y for _, _, y in nodes],
+            [number[node] for node in nodes],
+            [black_wins[node] for node in nodes],
+        )
+
+    @staticmethod
+    async def add_game(moves: Sequence[FakeMove], size: int, black_won: bool) -> None:
+        """"""
+
+        await OpeningNode.add_games([(moves, black_won)], size)
+
+    @staticmethod
+    async def rebuild(batch_size: int = 1000) -> None:
+        """
+        Fill the tree from scratch with all finished games.
+        """
+
+        from hex_forest.models.game import Game, Status
+
+        await OpeningNode.all().delete()
+
+        offset = 0
+        while True:
+            games = await Game.filter(status__in=[Status.WHITE_WON, Status.BLACK_WON]).order_by("id").offset(
+                offset
+            ).limit(batch_size)
+            if not games:
+                return
+
+            for size in {game.board_size for game in games}:
+                await OpeningNode.add_games(
+                    [(game.fake_moves, game.black_won) for game in games if game.board_size == size], size
+                )
+
+            offset += len(games)
+            print(f"added {offset} games to the opening tree")
+
+    @staticmethod
+    async def get_canonical_suggestions(size: int, position_hash: int, first_move: bool) -> List[Suggestion]:
+        """
+        Most played next moves from the canonical position, in its orientation, as `top_suggestions` takes them.
+        """
+
+        from hex_forest.models.queries import OPENING_SUGGESTIONS
+
+        return await OPENING_SUGGESTIONS.fetch(
+            size, to_signed(position_hash), FIRST_MOVE_SUGGESTIONS if first_move else SUGGESTIONS
+        )
+
+    @staticmethod
+    async def get_review(moves: Sequence[FakeMove], size: int) -> List[List[Suggestion]]:
+        """
+        Suggestions of every prefix of the moves in one query, see `hex_forest.common.openings.prefix_positions`.
+        """
+
+        from hex_forest.models.queries import OPENING_REVIEW
+
+        positions = list(prefix_positions(moves, size))
+        nodes: Dict[int, List[Suggestion]] = defaultdict(list)
+        for position_hash, *suggestion in await OPENING_REVIEW.fetch(
+            size, list({to_signed(position_hash) for position_hash, _ in positions}), FIRST_MOVE_SUGGESTIONS
+        ):
+            nodes[position_hash].append(tuple(suggestion))
+
+        return [
+            top_suggestions(nodes[to_signed(position_hash)], symmetries, size, i == 0)
+            for i, (position_hash, symmetries) in enumerate(positions)
+        ]
+
+    @staticmethod
+    async def archive_version() -> str:
+        """
+        Changes when the tree is rebuilt, as the rows get new ids, but not when games are added to it.
+        """
+
+        first = await OpeningNode.all().order_by("id").first()
+        return f"{MAX_ARCHIVE_RECORD_LENGTH}:{first.id if first else 0}"
@@ -4,7 +4,7 @@ from __future__ import annotations
 import asyncio
 import json
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Iterable
+from typing import TYPE_CHECKING, Optional, Dict, Iterable
 
 from cache import AsyncLRU
 from tortoise import Model, fields, BaseDBAsyncClient
@@ -13,6 +13,9 @@ from websockets.legacy.server import WebSocketServerProtocol
 
 from hex_forest.constants import LG_IMPORT_OWNER_NAME
 
+if TYPE_CHECKING:
+    from hex_forest.models.queries import PlayerRow
+
 ONLINE_THRESHOLD: int = 30  # seconds
 
 
@@ -75,5 +78,7 @@ class Player(Model, OnlinePlayer):
 
     @staticmethod
     @AsyncLRU(128)
-    async def get_by_cookie(cookie: str) -> Player:
-        return await Player.filter(cookie=cookie).first()
+    async def get_by_cookie(cookie: str) -> Optional[PlayerRow]:
+        from hex_forest.models.queries import PLAYER_BY_COOKIE
+
+        return await PLAYER_BY_COOKIE.fetch_one(cookie)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Hot queries run straight on asyncpg, with rows decoded into named tuples instead of model instances.
+
+Statements take parameters instead of formatted values, so asyncpg prepares each of them once per connection of the
+pool and reuses it from its statement cache, and Postgres does not plan them again on every call.
+"""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from time import perf_counter
+from typing import Any, Callable, Dict, Generic, List, NamedTuple, Optional, Sequence, Tuple, TypeVar
+
+from tortoise import connections
+
+from hex_forest.common.codec import Packed, decode_moves
+from hex_forest.common.openings import Suggestion
+from hex_forest.models.game import Status, Variant
+from hex_forest.models.move import FakeMove
+
+Row = TypeVar("Row")
+
+QUERIES: List[Query] = []
+"""Every query, in the order of definition."""
+
+
+class PlayerRow(NamedTuple):
+    """"""
+
+    name: str
+    cookie: str
+
+
+class GameRow(NamedTuple):
+    """
+    Columns of the game table needed to show a game, players are referenced by name.
+    """
+
+    id: int
+    status: Status
+    variant: Variant
+    board_size: int
+    swapped: bool
+    owner_name: str
+    white_name: Optional[str]
+    black_name: Optional[str]
+    packed_moves: Optional[Packed]
+
+    @classmethod
+    def decode(cls, record: Sequence[Any]) -> GameRow:
+        id_, status, variant, *columns = record
+        return cls(id_, Status(status), Variant(variant), *columns)
+
+    @property
+    def fake_moves(self) -> List[FakeMove]:
+        """
+        Same as `Game.fake_moves`.
+        """
+
+        return decode_moves(self.packed_moves or b"", self.board_size)
+
+
+@dataclass
+class QueryStats:
+    """
+    Timing of one query, including the wait for a connection of the pool.
+    """
+
+    calls: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+class Query(Generic[Row]):
+    """
+    A parameterized statement and how to decode its rows.
+    """
+
+    def __init__(self, name: str, sql: str, decode: Callable[[Sequence[Any]], Row]) -> None:
+        self.name = name
+        self.sql = sql
+        self.decode = decode
+        self.stats = QueryStats()
+
+        QUERIES.append(self)
+
+    async def fetch(self, *args: Any) -> List[Row]:
+        """"""
+
+        start = perf_counter()
+        async with connections.get("default").acquire_connection() as connection:
+            records = await connection.fetch(self.sql, *args)
+        rows = [self.decode(record) for record in records]
+
+        seconds = perf_counter() - start
+        self.stats.calls += 1
+        self.stats.seconds += seconds
+        self.stats.max_seconds = max(self.stats.max_seconds, seconds)
+        return rows
+
+    async def fetch_one(self, *args: Any) -> Optional[Row]:
+        """"""
+
+        rows = await self.fetch(*args)
+        return rows[0] if rows else None
+
+
+GAME_COLUMNS: str = "id, status, variant, board_size, swapped, owner_id, white_id, black_id, packed_moves"
+
+OPENING_SUGGESTIONS: Query[Suggestion] = Query(
+    "opening_suggestions",
+    """
+    select number, black_wins, x, y from opening_node where board_size = $1 and position_hash = $2
+    order by number desc, y, x limit $3
+    """,
+    tuple,
+)
+
+OPENING_REVIEW: Query[Tuple[int, int, int, int, int]] = Query(
+    "opening_review",
+    """
+    select position_hash, number, black_wins, x, y from (
+        select position_hash, number, black_wins, x, y,
+            row_number() over (partition by position_hash order by number desc, y, x) as rank
+        from opening_node where board_size = $1 and position_hash = any($2::bigint[])
+    ) ranked where rank <= $3
+    """,
+    tuple,
+)
+
+ADD_OPENING_NODES: Query[Any] = Query(
+    "add_opening_nodes",
+    """
+    insert into opening_node (board_size, position_hash, x, y, number, black_wins)
+    select $1::int, * from unnest($2::bigint[], $3::int[], $4::int[], $5::int[], $6::int[])
+    on conflict (board_size, position_hash, x, y) do update set
+        number = opening_node.number + excluded.number,
+        black_wins = opening_node.black_wins + excluded.black_wins
+    """,
+    tuple,
+)
+
+OPEN_GAMES: Query[GameRow] = Query(
+    "open_games",
+    f"""
+    select {GAME_COLUMNS} from game where status = any($1::smallint[])
+    order by status, started_at desc
+    """,
+    GameRow.decode,
+)
+
+FINISHED_GAMES: Query[GameRow] = Query(
+    "finished_games",
+    f"""
+    select {GAME_COLUMNS} from game where board_size = $1 and status = any($2::smallint[])
+    order by started_at desc limit $3
+    """,
+    GameRow.decode,
+)
+
+GAME_BY_ID: Query[GameRow] = Query(
+    "game_by_id",
+    f"select {GAME_COLUMNS} from game where id = $1",
+    GameRow.decode,
+)
+
+PLAYER_BY_COOKIE: Query[PlayerRow] = Query(
+    "player_by_cookie",
+    "select name, cookie from player where cookie = $1 limit 1",
+    PlayerRow._make,
+)
+
+
+def report() -> Dict[str, Dict[str, Any]]:
+    """
+    Calls, total and longest time in seconds, and mean time in milliseconds per query.
+    """
+
+    return {
+        query.name: {
+            **asdict(query.stats),
+            "mean_ms": query.stats.seconds / query.stats.calls * 1000 if query.stats.calls else 0.0,
+        }
+        for query in QUERIES
+    }
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import asyncio
+import os
 import ssl
 from argparse import ArgumentParser
 from multiprocessing import Process
@@ -7,8 +8,11 @@ from multiprocessing import Process
 from tortoise import Tortoise, run_async
 from websockets import serve, unix_serve
 
+from hex_forest.common.archive_snapshot import export_forever
 from hex_forest.config import config
 from hex_forest.http_server import HttpServer
+from hex_forest.models import ArchiveRecord, Game, OpeningNode
+from hex_forest.views.archive_view import ArchiveView
 from hex_forest.ws_server import WsServer
 
 
@@ -21,6 +25,13 @@ async def start_database():
         pass
 
 
+async def open_archive_disk_cache():
+    if config.archive_disk_cache_path:
+        ArchiveRecord.archive_disk_cache.open(
+            config.archive_disk_cache_path, await OpeningNode.archive_version(), config.archive_disk_cache_seconds
+        )
+
+
 def start_websocket(unix: bool = True):
     import uvloop
     uvloop.install()
@@ -32,13 +43,23 @@ def start_websocket(unix: bool = True):
 
     async def serve_websocket():
         print("starting websocket server...")
-        async with serve(WsServer().listen, host="localhost", port=8080, ssl=ssl_context):
-            await asyncio.Future()  # run forever
+        await open_archive_disk_cache()  # finished games invalidate positions in the file
+        ws_server = WsServer()
+        async with serve(ws_server.listen, host="localhost", port=8080, ssl=ssl_context):
+            try:
+                await asyncio.Future()  # run forever
+            finally:
+                await ws_server.games.flush()
 
     async def unix_serve_websocket():
         print("starting websocket server...")
-        async with unix_serve(WsServer().listen, path=config.ws_unix_path, ssl=ssl_context):
-            await asyncio.Future()  # run forever
+        await open_archive_disk_cache()  # finished games invalidate positions in the file
+        ws_server = WsServer()
+        async with unix_serve(ws_server.listen, path=config.ws_unix_path, ssl=ssl_context):
+            try:
+                await asyncio.Future()  # run forever
+            finally:
+                await ws_server.games.flush()
 
     if unix:
         asyncio.run(unix_serve_websocket())
@@ -47,11 +68,31 @@ def start_websocket(unix: bool = True):
 
 
 def start_http():
+    ArchiveRecord.archive_record_cache.max_bytes = config.archive_cache_bytes
+    ArchiveRecord.archive_record_cache.ttl = config.archive_cache_seconds
+    run_async(open_archive_disk_cache())
+    if config.archive_tries and not (config.archive_snapshot_path and os.path.exists(config.archive_snapshot_path)):
+        # loaded before the server forks its workers, so that they share the memory until it changes
+        run_async(ArchiveView.opening_tries.load())
     HttpServer().run("0.0.0.0", config.http_port)
 
 
+def start_snapshot():
+    # in its own process, as every rebuild decodes all finished games
+    if not config.archive_snapshot_path:
+        print("archive snapshot path is not configured")
+        return
+
+    run_async(export_forever(config.archive_snapshot_path))
+
+
 parser = ArgumentParser()
-parser.add_argument("-t", "--target", choices=["http", "ws", "wsunix", "both", "local"], default="both")
+parser.add_argument(
+    "-t",
+    "--target",
+    choices=["http", "ws", "wsunix", "both", "local", "archive", "openings", "snapshot"],
+    default="both",
+)
 
 args = parser.parse_args()
 
@@ -66,14 +107,27 @@ elif args.target == "wsunix":
 elif args.target == "http":
     start_http()
 
+elif args.target == "archive":
+    run_async(Game.archive_finished())
+
+elif args.target == "openings":
+    run_async(OpeningNode.rebuild())
+
+elif args.target == "snapshot":
+    start_snapshot()
+
 elif args.target == "local":
     websocket_server = Process(target=start_websocket, args=(False,))
     websocket_server.start()
+    if config.archive_snapshot_path:
+        Process(target=start_snapshot).start()
 
     start_http()
 
 else:
     websocket_server = Process(target=start_websocket)
     websocket_server.start()
+    if config.archive_snapshot_path:
+        Process(target=start_snapshot).start()
 
     start_http()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Compare `BatchBoard.winner` with a Python loop of `Board.winner` on random games stopped at random moves.
+
+Run with `PYTHONPATH=. python hex_forest/tests/bench/batch_board.py`.
+"""
+from random import Random
+from time import perf_counter
+from typing import List, Tuple
+
+from hex_forest.common.batch_board import NO_WINNER, BatchBoard
+from hex_forest.common.board import Board
+from hex_forest.models.move import FakeMove
+
+SIZES: Tuple[int, ...] = (7, 11, 13, 19)
+POSITIONS: int = 10000
+
+
+def random_boards(size: int, n: int, seed: int = 0) -> List[Board]:
+    rnd = Random(seed)
+    boards = []
+    for _ in range(n):
+        board = Board(size=size)
+        for i, cell in enumerate(rnd.sample(range(size**2), rnd.randint(0, size**2))):
+            board.push(FakeMove(i, cell % size, cell // size))
+        boards.append(board)
+    return boards
+
+
+if __name__ == "__main__":
+    for size in SIZES:
+        boards = random_boards(size, POSITIONS)
+
+        start = perf_counter()
+        expected = [board.winner() for board in boards]
+        loop_seconds = perf_counter() - start
+
+        batch = BatchBoard.from_boards(boards)
+        start = perf_counter()
+        winners = batch.winner()
+        batch_seconds = perf_counter() - start
+
+        assert [None if w == NO_WINNER else bool(w) for w in winners] == expected, f"differs on size {size}"
+
+        print(
+            f"size {size:>2} | {POSITIONS} positions | "
+            f"loop: {POSITIONS / loop_seconds:10.0f} pos/s | batch: {POSITIONS / batch_seconds:10.0f} pos/s | "
+            f"{loop_seconds / batch_seconds:5.1f}x",
+            flush=True,
+        )
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Compare win detection engines on random positions and on random games played move by move.
+
+Run with `PYTHONPATH=. python hex_forest/tests/bench/board_connectivity.py`.
+
+Union-find only follows `push` and `pop`, so it is compared on games. The recursive engine does not share visited cells between branches and gets exponential on dense boards, so it is only
+timed up to `RECURSIVE_MAX_SIZE`. Every engine is checked against a plain breadth-first search on all sizes.
+"""
+from collections import deque
+from random import Random
+from timeit import timeit
+from typing import List, Tuple
+
+from hex_forest.common import BitBoard
+from hex_forest.common.board import Board, Connectivity
+from hex_forest.models.move import FakeMove
+
+SIZES: Tuple[int, ...] = (5, 7, 9, 11, 13, 15, 19)
+POSITIONS: int = 200
+RECURSIVE_MAX_SIZE: int = 7
+
+
+def random_positions(size: int, n: int, seed: int = 0) -> List[Tuple[BitBoard, BitBoard]]:
+    """
+    Positions with every cell filled at random, half-way filled and nearly empty.
+    """
+
+    rnd = Random(seed)
+    positions = []
+    for i in range(n):
+        cells = list(range(size**2))
+        rnd.shuffle(cells)
+        cells = cells[: (size**2 * (i % 3 + 1)) // 3]
+
+        blacks = whites = 0
+        for j, cell in enumerate(cells):
+            if j % 2:
+                whites |= 1 << cell
+            else:
+                blacks |= 1 << cell
+        positions.append((blacks, whites))
+    return positions
+
+
+def reference(size: int, stones: BitBoard, vertical: bool) -> bool:
+    """
+    Breadth-first search over (x, y) coordinates, independent of any bitboard shifting.
+    """
+
+    cells = {(i % size, i // size) for i in range(size**2) if stones >> i & 1}
+    queue = deque(c for c in cells if (c[1] if vertical else c[0]) == 0)
+    visited = set(queue)
+    while queue:
+        x, y = queue.popleft()
+        if (y if vertical else x) == size - 1:
+            return True
+        for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1), (-1, 1), (1, -1)):
+            neighbour = (x + dx, y + dy)
+            if neighbour in cells and neighbour not in visited:
+                visited.add(neighbour)
+                queue.append(neighbour)
+    return False
+
+
+def results(board: Board, positions: List[Tuple[BitBoard, BitBoard]]) -> List[Tuple[bool, bool]]:
+    out = []
+    for blacks, whites in positions:
+        board.occupied_co = {False: blacks, True: whites}
+        out.append((board.is_black_win(), board.is_white_win()))
+    return out
+
+
+def play_out(board: Board, games: List[List[int]]) -> List[int]:
+    """
+    Play every game until it is won, checking the winner after each move, then take all moves back.
+
+    Returns length of each game.
+    """
+
+    size = board.size
+    lengths = []
+    for cells in games:
+        for i, cell in enumerate(cells):
+            board.push(FakeMove(i, cell % size, cell // size))
+            if board.is_game_over():
+                break
+        lengths.append(len(board.move_stack))
+
+        while board.move_stack:
+            board.pop()
+        assert not board.occupied_co[False] and not board.occupied_co[True]
+    return lengths
+
+
+if __name__ == "__main__":
+    for size in SIZES:
+        positions = random_positions(size, POSITIONS)
+        boards = {
+            c: Board(size=size, connectivity=c)
+            for c in (Connectivity.RECURSIVE, Connectivity.FLOOD_FILL)
+            if c is not Connectivity.RECURSIVE or size <= RECURSIVE_MAX_SIZE
+        }
+
+        expected = [
+            (reference(size, blacks, True), reference(size, whites, False))
+            for blacks, whites in positions
+        ]
+        line = [f"size {size:>2}"]
+        for connectivity, board in boards.items():
+            assert results(board, positions) == expected, f"{connectivity.name} differs on size {size}"
+
+            seconds = timeit(lambda: results(board, positions), number=5)
+            line.append(f"{connectivity.name.lower()}: {seconds / 5 / POSITIONS * 1e6:8.1f} us")
+
+        print(" | ".join(line), flush=True)
+
+    print("winner() after every move of a game, then undo of all moves")
+    for size in SIZES:
+        rnd = Random(size)
+        games = [rnd.sample(range(size**2), size**2) for _ in range(POSITIONS // 10)]
+
+        boards = {c: Board(size=size, connectivity=c) for c in Connectivity if c is not Connectivity.RECURSIVE}
+        expected = play_out(boards[Connectivity.FLOOD_FILL], games)
+        line = [f"size {size:>2}"]
+        for connectivity, board in boards.items():
+            assert play_out(board, games) == expected, f"{connectivity.name} differs on size {size}"
+
+            seconds = timeit(lambda: play_out(board, games), number=5)
+            line.append(f"{connectivity.name.lower()}: {seconds / 5 / len(games) * 1e3:8.2f} ms/game")
+
+        print(" | ".join(line), flush=True)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Time `PrefixMatcher.suggestions` on archives of 100k and 1M synthetic games, after checking it against `OpeningTrie`.
+
+Games start with one of a few hundred popular lines, so that prefixes match many games as in a real archive.
+
+Run with `PYTHONPATH=. python hex_forest/tests/bench/prefix_matcher.py`.
+"""
+from random import Random
+from time import perf_counter
+from typing import List, Sequence, Tuple
+
+from hex_forest.common.opening_trie import OpeningTrie
+from hex_forest.common.prefix_matcher import OPENING_PLIES, PrefixMatcher
+from hex_forest.models.move import FakeMove
+
+SIZE: int = 13
+ARCHIVES: Tuple[int, ...] = (100_000, 1_000_000)
+CHECKED_GAMES: int = 20_000
+LINES: int = 300
+LINE_LENGTH: int = 6
+QUERIES: int = 200
+
+
+def random_games(n: int, seed: int = 0) -> List[Tuple[List[FakeMove], bool]]:
+    rnd = Random(seed)
+    n_cells = SIZE**2
+    lines = [rnd.sample(range(n_cells), LINE_LENGTH) for _ in range(LINES)]
+    weights = [1 / (i + 1) for i in range(LINES)]
+
+    games = []
+    for line in rnd.choices(lines, weights, k=n):
+        rest = rnd.sample([cell for cell in range(n_cells) if cell not in line], OPENING_PLIES - LINE_LENGTH)
+        cells = line + rest
+        games.append(([FakeMove(i, cell % SIZE, cell // SIZE) for i, cell in enumerate(cells)], rnd.random() < 0.5))
+    return games
+
+
+def queries(games: Sequence[Tuple[List[FakeMove], bool]], seed: int = 1) -> List[List[FakeMove]]:
+    rnd = Random(seed)
+    return [rnd.choice(games)[0][: rnd.randint(0, OPENING_PLIES - 1)] for _ in range(QUERIES)]
+
+
+if __name__ == "__main__":
+    games = random_games(CHECKED_GAMES)
+    trie = OpeningTrie(SIZE)
+    for moves, black_won in games:
+        trie.add_game(moves, black_won)
+    matcher = PrefixMatcher.from_games(games, SIZE)
+    for prefix in queries(games):
+        assert matcher.suggestions(prefix) == trie.suggestions(prefix), f"differs on {prefix}"
+    print(f"{CHECKED_GAMES} games | same suggestions as the opening trie on {QUERIES} positions", flush=True)
+
+    for n_games in ARCHIVES:
+        games = random_games(n_games)
+        matcher = PrefixMatcher.from_games(games, SIZE)
+        prefixes = queries(games)
+        del games
+
+        for length in (0, 1, 2, 4, 8, OPENING_PLIES - 1):
+            selected = [prefix[:length] for prefix in prefixes if len(prefix) >= length][:50]
+
+            start = perf_counter()
+            for prefix in selected:
+                matcher.suggestions(prefix)
+            seconds = (perf_counter() - start) / len(selected)
+
+            print(
+                f"{n_games:>9} games | {matcher.cells.nbytes / 2**20:6.1f} MB | prefix of {length:>2} | "
+                f"{seconds * 1000:8.2f} ms per query",
+                flush=True,
+            )
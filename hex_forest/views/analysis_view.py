@@ -4,10 +4,12 @@ from typing import List, Optional
 
 from japronto.request.crequest import Request
 from japronto.response.py import Response
+from tortoise.exceptions import DoesNotExist
 
-from hex_forest.common.board import Board, Cell
+from hex_forest.common.cell import Cell, render_cells
 from hex_forest.constants import MAX_ARCHIVE_RECORD_LENGTH
-from hex_forest.models.move import FakeMove, Move
+from hex_forest.models import Game
+from hex_forest.models.move import FakeMove
 from hex_forest.views.archive_view import ArchiveView
 from hex_forest.views.base_view import BaseView
 
@@ -27,6 +29,7 @@ class AnalysisView(BaseView):
         self._routes += [
             ("/analysis", self.analysis_board),
             ("/analysis/game/{game_id}", self.analysis_board_from_game),
+            ("/analysis/review/{game_id}", self.game_review),
         ]
 
     # @route("/game")
@@ -34,8 +37,11 @@ class AnalysisView(BaseView):
     async def analysis_board(request: Request) -> Response:
         action: Optional[str] = request.query.get("action")
         moves_str: Optional[str] = request.query.get("moves")
+        packed: Optional[str] = request.query.get("packed")
 
-        if action == "rotate":
+        if packed:
+            return await AnalysisView.analysis_board_from_packed(request, packed)
+        elif action == "rotate":
             return await AnalysisView.analysis_board_action(
                 request, moves_str, action=Action.ROTATE
             )
@@ -54,6 +60,15 @@ class AnalysisView(BaseView):
 
         return await AnalysisView.analysis_board_with_archive(request, moves)
 
+    @staticmethod
+    async def analysis_board_from_packed(request: Request, packed: str) -> Response:
+        try:
+            _, moves = ArchiveView.moves_from_packed(request, packed)
+        except ValueError as e:
+            return request.Response(code=400, json={"error": f"Invalid packed moves: {e}"})
+
+        return await AnalysisView.analysis_board_with_archive(request, moves)
+
     @staticmethod
     async def analysis_board_action(
         request: Request, moves_str: Optional[str], action: Action
@@ -94,26 +109,53 @@ class AnalysisView(BaseView):
     @staticmethod
     async def analysis_board_from_game(request: Request) -> Response:
         game_id = request.match_dict["game_id"]
-        moves = [move.fake() for move in await Move.filter(game_id=game_id)]
+        try:
+            game = await Game.get(id=game_id)
+        except (DoesNotExist, ValueError):
+            return request.Response(code=404, json={"error": f"Game with id {game_id} does not exist."})
+        moves = game.fake_moves
 
         return await AnalysisView.analysis_board_with_archive(request, moves)
 
+    @staticmethod
+    async def game_review(request: Request) -> Response:
+        """
+        Archive suggestions of every position of the game opening at once, to browse it without a request per move.
+
+        `suggestions[i]` are after the first `i` moves, each as `[number, black_wins, x, y]`.
+        """
+
+        game_id = request.match_dict["game_id"]
+        try:
+            game = await Game.get_by_id(game_id)
+        except (DoesNotExist, ValueError):
+            return request.Response(code=404, json={"error": f"Game with id {game_id} does not exist."})
+
+        moves = game.fake_moves
+        review = await ArchiveView.get_review(tuple(moves), game.board_size)
+        return request.Response(
+            json={
+                "size": game.board_size,
+                "moves": [[move.x, move.y] for move in moves[: len(review) - 1]],
+                "suggestions": [[list(suggestion) for suggestion in suggestions] for suggestions in review],
+            }
+        )
+
     @staticmethod
     async def analysis_board_with_archive(
         request: Request, moves: List[FakeMove]
     ) -> Response:
-        size = request.headers.get("board-size", 13)
-        board = Board(size=size)
+        size = int(request.headers.get("board-size", 13))
 
         archive_games = (
             []
             if len(moves) > MAX_ARCHIVE_RECORD_LENGTH
-            else await ArchiveView.get_archive_games(tuple(moves), size)
+            else await ArchiveView.get_suggestions(tuple(moves), size)
         )
 
         template_context = {
             "size": size,
-            "rows": board.rows,
+            "cells": render_cells(size, analysis=True),
             "mode": "analysis",
             "archive_games": archive_games,
             "archive_move_limit": MAX_ARCHIVE_RECORD_LENGTH,
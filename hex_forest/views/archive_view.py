@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import asyncio
 from re import match
+from time import time
 from typing import List, Tuple
 
 import requests
@@ -8,10 +9,18 @@ from asyncpg import InterfaceError
 from japronto.request.crequest import Request
 from japronto.response.py import Response
 from tortoise.exceptions import IntegrityError
-
-from hex_forest.common.board import Cell
-from hex_forest.constants import LG_IMPORT_OWNER_NAME
-from hex_forest.models import Game, Player, Move
+from tortoise.timezone import now
+
+from hex_forest.common.cell import Cell
+from hex_forest.common.codec import CodecError, decode_moves, encode_moves, from_url
+from hex_forest.common.archive_snapshot import SnapshotReader
+from hex_forest.common.cache_warmer import CacheWarmer
+from hex_forest.common.opening_trie import OpeningTries
+from hex_forest.common.openings import Suggestion, fold, position_hashes, top_suggestions
+from hex_forest.common.prefetcher import Prefetcher
+from hex_forest.config import config
+from hex_forest.constants import BOARD_SIZES, LG_IMPORT_OWNER_NAME
+from hex_forest.models import Game, OpeningNode, Player
 from hex_forest.models.archive_record import ArchiveRecord
 from hex_forest.models.game import Status
 from hex_forest.models.move import FakeMove
@@ -27,13 +36,70 @@ class ArchiveView(BaseView):
     Archive views for browsing finished games.
     """
 
+    opening_tries: OpeningTries = OpeningTries()
+    """Archive suggestions held in memory, loaded before the server starts."""
+
+    archive_snapshot: SnapshotReader = SnapshotReader(config.archive_snapshot_path)
+    """All finished games in a file shared by the workers, preferred over `opening_tries` when present."""
+
+    cache_warmer: CacheWarmer = CacheWarmer(
+        ArchiveRecord.archive_record_cache, lambda moves, size: ArchiveView.get_archive_games(moves, size)
+    )
+    """Fills the cache of `get_archive_games` when suggestions come from the database."""
+
+    prefetcher: Prefetcher = Prefetcher(
+        ArchiveRecord.archive_record_cache,
+        lambda moves, size: ArchiveView.get_archive_games(moves, size),
+        config.archive_prefetch_children,
+        config.archive_prefetch_concurrency,
+    )
+    """Reads positions likely to be requested next into the cache of `get_archive_games`."""
+
     def __init__(self):
         super().__init__()
         self._routes += [
             ("/archive/lg_import/{game_id}", self.lg_import),
             ("/archive/lg_bulk_import/{player_id}", self.lg_bulk_import),
+            ("/archive/memory", self.memory_report),
+            ("/archive/cache", self.cache_report),
         ]
 
+    @staticmethod
+    async def memory_report(request: Request) -> Response:
+        """
+        Size of the in-memory archive per board size.
+        """
+
+        return request.Response(json=ArchiveView.opening_tries.memory_report())
+
+    @staticmethod
+    async def cache_report(request: Request) -> Response:
+        """
+        Hits, misses, evictions and bytes of the archive suggestion cache of this worker, its last warming and hits of
+        prefetched positions.
+        """
+
+        return request.Response(
+            json={
+                **ArchiveRecord.archive_record_cache.report(),
+                "warmer": ArchiveView.cache_warmer.report,
+                "prefetch": ArchiveView.prefetcher.report(),
+            }
+        )
+
+    @staticmethod
+    def moves_from_packed(request: Request, packed: str) -> Tuple[int, List[FakeMove]]:
+        """
+        Board size from the `board-size` header and the moves packed by `hex_forest.common.codec`.
+
+        :raises ValueError: if either is not valid
+        """
+
+        size = int(request.headers.get("board-size", 13))
+        if size not in BOARD_SIZES:
+            raise CodecError(f"board size must be one of {BOARD_SIZES}")
+        return size, decode_moves(from_url(packed), size)
+
     # @route("/game")
     @staticmethod
     async def lg_import(request: Request) -> Response:
@@ -45,8 +111,6 @@ class ArchiveView(BaseView):
         )
         await ArchiveView._lg_import_from_text(response.text)
 
-        asyncio.create_task(ArchiveView._invalidate_for_game(game_id))
-
         return request.Response(
             code=301,
             mime_type="text/html",
@@ -56,11 +120,6 @@ class ArchiveView(BaseView):
             },
         )
 
-    @staticmethod
-    async def _invalidate_for_game(game_id: int) -> None:
-        game = await Game.get(id=game_id)
-        await game.invalidate_archive_record_cache()
-
     @staticmethod
     async def lg_bulk_import(request: Request) -> Response:
         """"""
@@ -85,7 +144,9 @@ class ArchiveView(BaseView):
             except ValueError as e:
                 print(e)
 
-        ArchiveRecord.archive_record_cache.clear()
+        if ArchiveView.archive_snapshot.get() is None and not ArchiveView.opening_tries.loaded:
+            # imported games dropped the cached positions they went through
+            ArchiveView.start_warming(again=True)
 
         return request.Response(
             code=301,
@@ -158,6 +219,15 @@ class ArchiveView(BaseView):
         if not status:
             raise ValueError(f"Unknown game result: {result}")
 
+        fake_moves = []
+        for i, move in enumerate(moves):
+            x = ord(move[2]) - 97
+            y = ord(move[3]) - 97
+            if has_swap and i != 0:
+                x, y = Cell.swap(x, y)
+
+            fake_moves.append(FakeMove(index=i, x=x, y=y))
+
         game = await Game.create(
             owner_id=LG_IMPORT_OWNER_NAME,
             white=white[0],
@@ -166,73 +236,80 @@ class ArchiveView(BaseView):
             board_size=size,
             swapped=has_swap,
             lg_import_id=game_id,
+            move_counter=len(fake_moves),
+            packed_moves=encode_moves(fake_moves, size),
+            archived=True,
+            finished_at=now(),  # import time, so that refreshing opening tries finds it by finish time
         )
+        await OpeningNode.add_game(fake_moves, size, game.black_won)
+        await game.invalidate_archive_record_cache(fake_moves)
+        if ArchiveView.opening_tries.loaded:
+            ArchiveView.opening_tries.add_game(game)
 
-        db_moves = []
-        for i, move in enumerate(moves):
-            x = ord(move[2]) - 97
-            y = ord(move[3]) - 97
-            if has_swap and i != 0:
-                x, y = Cell.swap(x, y)
+    @staticmethod
+    async def get_suggestions(moves: Tuple[FakeMove, ...], size: int) -> List[ArchiveRecord]:
+        """
+        Archive suggestions from the snapshot file or from memory, or from the database if neither is available.
+        """
+
+        snapshot = ArchiveView.archive_snapshot.get()
+        opening_tries = ArchiveView.opening_tries
+        if snapshot is not None:
+            suggestions = snapshot.suggestions(moves, size)
+        elif opening_tries.loaded:
+            opening_tries.start_refreshing()
+            suggestions = opening_tries.suggestions(moves, size)
+        else:
+            ArchiveView.start_warming()
+            ArchiveView.prefetcher.requested(moves, size)
+            suggestions = await ArchiveView.get_archive_games(moves, size)
+            ArchiveView.prefetcher.prefetch(moves, size, suggestions)
+
+        return [
+            ArchiveRecord(number=number, black_wins=black_wins, x=x, y=y)
+            for number, black_wins, x, y in suggestions
+        ]
+
+    @staticmethod
+    def start_warming(again: bool = False) -> None:
+        """
+        Warm the cache of `get_archive_games` in the background, see `CacheWarmer.start`.
+        """
 
-            db_moves.append(Move(game=game, index=i, x=x, y=y))
-        await Move.bulk_create(db_moves)
+        ArchiveView.cache_warmer.start(BOARD_SIZES, config.archive_warm_depth, config.archive_warm_seconds, again)
+
+    @staticmethod
+    async def get_review(moves: Tuple[FakeMove, ...], size: int) -> List[List[Suggestion]]:
+        """
+        Archive suggestions of every prefix of the moves, from the same store as `get_suggestions` would use, in one
+        pass over the snapshot or the tries or in one query.
+        """
+
+        snapshot = ArchiveView.archive_snapshot.get()
+        opening_tries = ArchiveView.opening_tries
+        if snapshot is not None:
+            return snapshot.review(moves, size)
+        elif opening_tries.loaded:
+            opening_tries.start_refreshing()
+            return opening_tries.review(moves, size)
+        else:
+            return await OpeningNode.get_review(moves, size)
 
     @staticmethod
     @ArchiveRecord.archive_record_cache
     async def get_archive_games(
         moves: Tuple[FakeMove, ...], size: int
-    ) -> List[ArchiveRecord]:
-        """"""
-
-        # TODO: query that joins proper games
-        moves_str = ",".join(
-            [
-                f"'{move.x},{move.y}{'B' if move.index % 2 == 0 else 'W'}'"
-                for move in moves
-            ]
-        )
-        moves_str_rotated = ",".join(
-            [
-                f"'{size - move.x - 1},{size - move.y - 1}{'B' if move.index % 2 == 0 else 'W'}'"
-                for move in moves
-            ]
-        )
-        n_moves = len(moves)
-
-        if n_moves:
-            # query unions the positions with 180 deg rotated positions, mirrored positions are not needed as database holds only games starting with black stone
-            records = await ArchiveRecord.raw(
-                f"""
-                with gamelength as (VALUES ({n_moves}))
-                select count(game_id) as number, sum(black_win) as black_wins, x, y from (
-                    select unioned.game_id, 
-                            CASE WHEN (game.status = {Status.BLACK_WON} and not game.swapped) or (game.status = {Status.WHITE_WON} and game.swapped) 
-                                THEN 1 ELSE 0 END as black_win,
-                            CASE WHEN unioned.rotated THEN {size - 1} - move.x ELSE move.x END as x,
-                            CASE WHEN unioned.rotated THEN {size - 1} - move.y ELSE move.y END as y from (
-                        select false as rotated, game_id from (select count(game_id) c, game_id from (
-                            select game_id, concat(x,',', y, CASE WHEN mod(move.index, 2) = 0 THEN 'B' ELSE 'W' END) as crd from move where move.index < (table gamelength)
-                        ) m where m.crd in ({moves_str}) group by game_id) grouped where grouped.c = (table gamelength)
-                        union all
-                        select true as rotated, game_id from (select count(game_id) c, game_id from (
-                            select game_id, concat(x,',', y, CASE WHEN mod(move.index, 2) = 0 THEN 'B' ELSE 'W' END) as crd from move where move.index < (table gamelength)
-                        ) m where m.crd in ({moves_str_rotated}) group by game_id) grouped where grouped.c = (table gamelength)
-                    ) unioned join game on game.id = unioned.game_id and game.board_size = {size} join move on move.index = (table gamelength) and move.game_id = unioned.game_id
-                ) calculated group by x, y order by number desc limit 10;
-                """
-            )
-        else:
-            records = await ArchiveRecord.raw(
-                f"""
-                select count(id) as number, sum(id) as black_wins, x, y from (
-                    select CASE WHEN game.status = {Status.BLACK_WON} THEN 1 ELSE 0 END as id, x, y from (
-                        select x, y, game_id from move where index = 0 and (x + y < {size - 1} or (x + y = {size - 1} and x <= {int(size/2)}))
-                        union all
-                        select ({size - 1} - x) as x, ({size - 1} - y) as y, game_id from move where index = 0 and (x + y > {size - 1} or (x + y = {size - 1} and x > {int(size/2)}))
-                    ) all_moves join game on all_moves.game_id = game.id where game.board_size = {size}
-                ) all_moves_in_game group by x, y order by number desc limit 15
-                """
-            )
-
-        return records
+    ) -> List[Suggestion]:
+        """
+        Suggestions of the opening tree, through `ArchiveRecord.archive_disk_cache` per canonical position.
+        """
+
+        position_hash, symmetries = fold(position_hashes(moves, size))
+        key = (size, position_hash)
+        suggestions = await ArchiveRecord.archive_disk_cache.get(key)
+        if suggestions is None:
+            read_at = time()
+            suggestions = await OpeningNode.get_canonical_suggestions(size, position_hash, not moves)
+            await ArchiveRecord.archive_disk_cache.put(key, suggestions, read_at)
+
+        return top_suggestions(suggestions, symmetries, size, not moves)
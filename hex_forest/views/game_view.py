@@ -1,16 +1,17 @@
 # -*- coding: utf-8 -*-
 import asyncio
 import traceback
-from typing import Tuple
+from typing import Optional, Tuple
 
 from asyncpg import TooManyConnectionsError
 from japronto.request.crequest import Request
 from japronto.response.py import Response
 from tortoise.exceptions import IntegrityError, DoesNotExist
 
-from hex_forest.common.board import Board, Cell
+from hex_forest.common.cell import Cell, render_cells
 from hex_forest.models import Player
 from hex_forest.models.game import Game, Status, Variant
+from hex_forest.models.queries import GameRow, PlayerRow
 from hex_forest.views.base_view import BaseView
 from hex_forest.views.variants.ai_view import AiView
 from hex_forest.views.variants.blind_hex_view import BlindHexView
@@ -29,7 +30,7 @@ class GameView(BaseView):
         ]
 
     @staticmethod
-    async def get_game_data(request: Request) -> Tuple[Player, Game]:
+    async def get_game_data(request: Request) -> Tuple[Optional[PlayerRow], GameRow]:
         cookie = request.cookies.get("livehex-pin")
         game_id = request.match_dict["game_id"]
 
@@ -70,23 +71,22 @@ class GameView(BaseView):
 
         # the NORMAL variant
         size = 13
-        board = Board(size=size)
 
-        moves = await game.moves.all().order_by("index")
+        moves = game.fake_moves
         last_move = moves[-1] if moves else None
         moves_n = len(moves)
         turn_int = 0 if game.status is not Status.IN_PROGRESS else 1 if moves_n % 2 == 1 else 2
 
         template_context = {
             "size": size,
-            "rows": board.rows,
+            "cells": render_cells(size, analysis=False),
             "mode": "game",
-            "owner": game.owner.name,
-            "white_player": game.white.name if game.white else "join",
-            "black_player": game.black.name if game.black else "join",
+            "owner": game.owner_name,
+            "white_player": game.white_name or "join",
+            "black_player": game.black_name or "join",
             "turn": turn_int,
             "show_swap": moves_n == 1,
-            "show_start": game.owner == player and game.status is Status.PENDING,
+            "show_start": player is not None and game.owner_name == player.name and game.status is Status.PENDING,
             "game_status": game.status,
             "game_status_text": f"status: {Status(game.status).name.lower().replace('_', ' ')}",
             "stones": [Cell.render_stone(move.color, move.y, move.x) for move in moves],
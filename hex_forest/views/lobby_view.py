@@ -12,7 +12,8 @@ from tortoise.timezone import now
 
 from hex_forest.config import config
 from hex_forest.constants import LG_IMPORT_OWNER_NAME, ADMIN_NAME
-from hex_forest.models import Player, Game
+from hex_forest.models import Game, Player
+from hex_forest.models.queries import GameRow
 from hex_forest.views.base_view import BaseView
 
 
@@ -95,7 +96,7 @@ class LobbyView(BaseView):
 
     @staticmethod
     def _collect_games(
-        games: List[Game], player: Optional[Player]
+        games: List[GameRow], player: Optional[Player]
     ) -> Tuple[List, List]:
         """"""
 
@@ -103,7 +104,7 @@ class LobbyView(BaseView):
         other_games = []
 
         for game in games:
-            if player and player == game.white or player == game.black:
+            if player and player.name in (game.white_name, game.black_name):
                 your_games.append(game)
             else:
                 other_games.append(game)
@@ -2,9 +2,9 @@
 from japronto.request.crequest import Request
 from japronto.response.py import Response
 
-from hex_forest.common.board import Board, Cell
-from hex_forest.models import Game, Player
+from hex_forest.common.cell import Cell, render_cells
 from hex_forest.models.game import Status
+from hex_forest.models.queries import GameRow, PlayerRow
 from hex_forest.views.base_view import BaseView
 
 
@@ -14,11 +14,10 @@ class AiView(BaseView):
     """
 
     @staticmethod
-    async def show_board(request: Request, player: Player, game: Game) -> Response:
+    async def show_board(request: Request, player: PlayerRow, game: GameRow) -> Response:
         size = 13
-        board = Board(size=size)
 
-        moves = await game.moves.all().order_by("index")
+        moves = game.fake_moves
         last_move = moves[-1] if moves else None
         moves_n = len(moves)
         turn_int = (
@@ -29,14 +28,14 @@ class AiView(BaseView):
 
         template_context = {
             "size": size,
-            "rows": board.rows,
+            "cells": render_cells(size, analysis=False),
             "mode": "ai",
-            "owner": game.owner.name,
-            "white_player": game.white.name if game.white else "join",
-            "black_player": game.black.name if game.black else "join",
+            "owner": game.owner_name,
+            "white_player": game.white_name or "join",
+            "black_player": game.black_name or "join",
             "turn": turn_int,
             "show_swap": moves_n == 1,
-            "show_start": game.owner == player and game.status is Status.PENDING,
+            "show_start": player is not None and game.owner_name == player.name and game.status is Status.PENDING,
             "game_status": game.status,
             "game_status_text": f"status: {Status(game.status).name.lower().replace('_', ' ')}",
             "stones": [Cell.render_stone(move.color, move.y, move.x) for move in moves],
@@ -4,9 +4,10 @@ from typing import List
 from japronto.request.crequest import Request
 from japronto.response.py import Response
 
-from hex_forest.common.board import Board, Cell
-from hex_forest.models import Game, Move, Player
+from hex_forest.common.cell import Cell, render_cells
 from hex_forest.models.game import Status
+from hex_forest.models.queries import GameRow, PlayerRow
+from hex_forest.models.move import FakeMove
 from hex_forest.views.base_view import BaseView
 
 
@@ -18,20 +19,19 @@ class BlindHexView:
     """
 
     @staticmethod
-    async def show_board(request: Request, player: Player, game: Game) -> Response:
+    async def show_board(request: Request, player: PlayerRow, game: GameRow) -> Response:
         size = 13
-        board = Board(size=size)
 
-        moves = await game.moves.all().order_by("index")
+        moves = game.fake_moves
 
-        visible_moves: List[Move] = []
+        visible_moves: List[FakeMove] = []
 
         last_pass_index = -1
         for move in moves:
             if (
                 (
-                    (game.white.name == player.name and move.color)
-                    or (game.black.name == player.name and not move.color)
+                    (game.white_name == player.name and move.color)
+                    or (game.black_name == player.name and not move.color)
                 )
                 and move.x == -1
                 and move.y == -1
@@ -40,8 +40,8 @@ class BlindHexView:
 
         for move in moves:
             if ((
-                (game.white.name == player.name and move.color)
-                or (game.black.name == player.name and not move.color)
+                (game.white_name == player.name and move.color)
+                or (game.black_name == player.name and not move.color)
             ) or move.index < last_pass_index) and move.x != -1 and move.y != -1:
                 visible_moves.append(move)
 
@@ -51,14 +51,14 @@ class BlindHexView:
 
         template_context = {
             "size": size,
-            "rows": board.rows,
+            "cells": render_cells(size, analysis=False),
             "mode": "blind",
-            "owner": game.owner.name,
-            "white_player": game.white.name if game.white else "join",
-            "black_player": game.black.name if game.black else "join",
+            "owner": game.owner_name,
+            "white_player": game.white_name or "join",
+            "black_player": game.black_name or "join",
             "turn": turn_int,
             "show_swap": moves_n == 1,
-            "show_start": game.owner == player and game.status is Status.PENDING,
+            "show_start": player is not None and game.owner_name == player.name and game.status is Status.PENDING,
             "game_status": game.status,
             "game_status_text": f"status: {Status(game.status).name.lower().replace('_', ' ')}",
             "stones": [
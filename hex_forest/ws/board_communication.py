@@ -1,15 +1,15 @@
 # -*- coding: utf-8 -*-
 import asyncio
-import traceback
-from typing import Awaitable, Callable, Dict, List
+from typing import Awaitable, Callable, Dict, List, Union
 
-from tortoise.exceptions import IntegrityError
 from tortoise.timezone import now
 from websockets.legacy.server import WebSocketServerProtocol
 
-from hex_forest.common.board import Cell
-from hex_forest.models import Game, Move, Player
-from hex_forest.models.game import Status, Variant
+from hex_forest.common.cell import Cell
+from hex_forest.models import Move, OpeningNode, Player
+from hex_forest.models.game import Game, Status, Variant
+from hex_forest.models.move import FakeMove
+from hex_forest.ws.game_registry import GameRegistry, LiveGame
 
 
 class BoardCommunication:
@@ -19,24 +19,45 @@ class BoardCommunication:
 
     _actions: Dict[str, Callable[[WebSocketServerProtocol, Dict, str], Awaitable[None]]]
 
+    games: GameRegistry
+    """Games in progress, the state all actions are served from."""
+
     def __init__(self):
         """"""
 
         super().__init__()
+        self.games = GameRegistry()
         self._actions.update(
             **{
-                "board_put": self._handle_put,
+                "board_put": self._in_game_actor(self._handle_put),
                 "board_remove": self._handle_remove,
                 "board_clear": self._handle_clear,
-                "board_join": self._handle_join,
-                "board_swap": self._handle_swap,
-                "board_pass": self._handle_pass,
-                "board_start": self._handle_start,
-                "board_resign": self._handle_resign,
-                "board_undo": self._handle_undo,
+                "board_join": self._in_game_actor(self._handle_join),
+                "board_swap": self._in_game_actor(self._handle_swap),
+                "board_pass": self._in_game_actor(self._handle_pass),
+                "board_start": self._in_game_actor(self._handle_start),
+                "board_resign": self._in_game_actor(self._handle_resign),
+                "board_undo": self._in_game_actor(self._handle_undo),
             }
         )
 
+    def _in_game_actor(
+        self, handler: Callable[[Player, Dict], Awaitable[None]]
+    ) -> Callable[[Player, Dict], Awaitable[None]]:
+        """
+        Run the handler on the actor of the game it concerns, so that actions on one game never overlap.
+        """
+
+        async def wrapper(player: Player, data: Dict) -> None:
+            game_id = data.get("game_id")
+            if game_id is None:
+                # analysis board, not related to any game
+                await handler(player, data)
+            else:
+                await self.games.submit(game_id, lambda: handler(player, data))
+
+        return wrapper
+
     async def _handle_put(self, player: Player, data: Dict) -> None:
         """"""
 
@@ -58,9 +79,8 @@ class BoardCommunication:
     async def _handle_game_put(self, player: Player, data: Dict) -> None:
         """"""
 
-        game = await Game.get(id=data["game_id"]).prefetch_related(
-            "owner", "white", "black", "moves"
-        )
+        live_game = await self.games.get(data["game_id"])
+        game = live_game.game
         if game.status != Status.IN_PROGRESS:
             message_dict = {
                 "action": "alert",
@@ -68,16 +88,29 @@ class BoardCommunication:
             }
             return await player.send(message_dict)
 
-        color = await game.turn
+        color = live_game.turn
 
         if game.variant is Variant.AI or ((color and player == game.white) or (not color and player == game.black)):
             cell_id: str = data["cell_id"]
-            x, y = Cell.id_to_xy(cell_id)
+            try:
+                x, y = Cell.id_to_xy(cell_id)
+            except ValueError:
+                x, y = -1, -1
+
+            if not live_game.is_legal(x, y):
+                message_dict = {
+                    "action": "alert",
+                    "message": f"cannot play at {cell_id}",
+                }
+                return await player.send(message_dict)
+
+            live_game.push(x, y)
+            winner = live_game.board.winner()
 
             message_dict = BoardCommunication.get_move_message_dict(player, color, x, y)
             if game.variant is Variant.AI and (player == game.white) == color:
                 message_dict["action"] = "moveAi"
-                message_dict["notation"] = await game.notation
+                message_dict["notation"] = live_game.notation
 
             send_to_game = (
                 (player.send(message_dict),)
@@ -93,16 +126,52 @@ class BoardCommunication:
                 ))
             )
 
-            await asyncio.wait([*send_to_game, self.create_move(game, x, y)])
+            await asyncio.wait(send_to_game)
+
+            if winner is not None:
+                await self._finish_game(live_game, Status.WHITE_WON if winner else Status.BLACK_WON, "won")
         else:
             # not your turn
             pass
 
+    async def _finish_game(self, live_game: LiveGame, result: Status, action: str) -> None:
+        """
+        Mark the game finished, let the players know and stop keeping it in memory.
+
+        A game that is not in progress is left as it is, so that it is never counted in the archive twice.
+        """
+
+        game = live_game.game
+        if game.status != Status.IN_PROGRESS:
+            return
+
+        game.status = result
+        game.finished_at = now()
+
+        message_dict = {
+            "action": action,
+            "color": True if result == Status.BLACK_WON else False,
+        }
+        moves = list(live_game.board.move_stack)
+        self.games.finish(live_game)
+
+        await asyncio.gather(
+            game.send(self.connected_clients_rev, message_dict), self._add_to_archive(game, moves)
+        )
+
     @staticmethod
-    async def create_move(game: Game, x: int, y: int) -> None:
-        """"""
+    async def _add_to_archive(game: Game, moves: List[FakeMove]) -> None:
+        """
+        Count the finished game in the archive, then drop the cached positions it went through.
 
-        await Move.create(game=game, x=x, y=y, index=await game.move_count)
+        Positions are invalidated only after the game is committed, so that a read in between cannot cache them again
+        without the game. A failed write is raised to the game actor, which logs it.
+        """
+
+        try:
+            await OpeningNode.add_game(moves, game.board_size, game.black_won)
+        finally:
+            await game.invalidate_archive_record_cache(moves)
 
     @staticmethod
     def get_move_message_dict(player: Player, color: bool, x: int, y: int) -> Dict:
@@ -120,7 +189,7 @@ class BoardCommunication:
         }
 
     @staticmethod
-    def get_pass_message_dict(player: Player, color: bool, moves: List[Move]) -> Dict:
+    def get_pass_message_dict(player: Player, color: bool, moves: List[Union[Move, FakeMove]]) -> Dict:
         """"""
 
         return {
@@ -172,9 +241,8 @@ class BoardCommunication:
     async def _handle_join(self, player: Player, data: Dict) -> None:
         """"""
 
-        game = await Game.get(id=data["game_id"]).prefetch_related(
-            "owner", "white", "black"
-        )
+        live_game = await self.games.get(data["game_id"])
+        game = live_game.game
         if player.is_guest:
             await player.send(
                 {"action": "alert", "message": "Cannot take side as guest."}
@@ -188,13 +256,15 @@ class BoardCommunication:
 
         color = data["color"]
         if game.variant is Variant.AI:
-            await self._take_ai_spot(game, player, color)
+            await self._take_ai_spot(live_game, player, color)
         else:
-            await self._take_spot(game, player, color)
+            await self._take_spot(live_game, player, color)
 
-    async def _take_spot(self, game: Game, player: Player, color) -> None:
+    async def _take_spot(self, live_game: LiveGame, player: Player, color) -> None:
         """"""
 
+        game = live_game.game
+
         action = "takeSpot"
         if color:
             if not game.white:
@@ -232,16 +302,14 @@ class BoardCommunication:
                 "player_name": player.name,
             }
 
-            tasks = [game.send(self.connected_clients_rev, message_dict), game.save()]
+            live_game.save()
+            await game.send(self.connected_clients_rev, message_dict)
 
-            try:
-                await asyncio.wait(tasks)
-            except IntegrityError:
-                traceback.print_exc()
-
-    async def _take_ai_spot(self, game, player, color):
+    async def _take_ai_spot(self, live_game: LiveGame, player: Player, color) -> None:
         """"""
 
+        game = live_game.game
+
         if color:
             game.white = player
             game.black = None
@@ -249,16 +317,16 @@ class BoardCommunication:
             game.white = None
             game.black = player
 
-        await asyncio.wait([player.send(
+        live_game.save()
+        await player.send(
             {"action": "takeSpotAi", "color": color, "player_name": player.name}
-        ), game.save()])
+        )
 
     async def _handle_swap(self, player: Player, data: Dict) -> None:
         """"""
 
-        game = await Game.get(id=data["game_id"]).prefetch_related(
-            "owner", "white", "black", "moves"
-        )
+        live_game = await self.games.get(data["game_id"])
+        game = live_game.game
 
         if game.white == player:
             white = game.white
@@ -268,9 +336,8 @@ class BoardCommunication:
             game.swapped = True
 
             message_dict = {"action": "swapped"}
-            await asyncio.wait(
-                [game.save(), game.send(self.connected_clients_rev, message_dict)]
-            )
+            live_game.save()
+            await game.send(self.connected_clients_rev, message_dict)
         else:
             # cannot swap as black
             pass
@@ -278,20 +345,19 @@ class BoardCommunication:
     async def _handle_pass(self, player: Player, data: Dict) -> None:
         """"""
 
-        game = await Game.get(id=data["game_id"]).prefetch_related(
-            "owner", "white", "black", "moves"
-        )
-        color = await game.turn
+        live_game = await self.games.get(data["game_id"])
+        game = live_game.game
+        color = live_game.turn
 
         if (color and player == game.white) or (not color and player == game.black):
-            x: int = -1
-            y: int = -1
+            moves = list(live_game.board.move_stack)
+            live_game.push(-1, -1)
 
-            message_dict = BoardCommunication.get_pass_message_dict(player, color, game.moves)
+            message_dict = BoardCommunication.get_pass_message_dict(player, color, moves)
             send_to_game = (
                 (game.send(
                     self.connected_clients_rev,
-                    BoardCommunication.get_pass_message_dict(player, color, game.moves),
+                    BoardCommunication.get_pass_message_dict(player, color, moves),
                 ),)
                 if game.variant is not Variant.BLIND
                 else (player.send(message_dict), game.send(
@@ -300,7 +366,7 @@ class BoardCommunication:
                 ))
             )
 
-            await asyncio.wait([*send_to_game, self.create_move(game, x, y)])
+            await asyncio.wait(send_to_game)
         else:
             # not your turn
             pass
@@ -308,24 +374,21 @@ class BoardCommunication:
     async def _handle_start(self, player: Player, data: Dict) -> None:
         """"""
 
-        game = await Game.get(id=data["game_id"]).prefetch_related(
-            "owner", "white", "black"
-        )
+        live_game = await self.games.get(data["game_id"])
+        game = live_game.game
 
         if game.owner == player and game.white is not None and game.black is not None:
             game.started_at = now()
             game.status = Status.IN_PROGRESS
 
-            await asyncio.wait(
-                [game.save(), game.send(self.connected_clients_rev, {"action": "gameStarted"})]
-            )
+            live_game.save()
+            await game.send(self.connected_clients_rev, {"action": "gameStarted"})
         elif game.owner == player and (game.white or game.black) and game.variant is Variant.AI:
             game.started_at = now()
             game.status = Status.IN_PROGRESS
 
-            await asyncio.wait(
-                [game.save(), player.send({"action": "gameStarted"})]
-            )
+            live_game.save()
+            await player.send({"action": "gameStarted"})
         else:
             # only owner can start
             message_dict = {
@@ -337,9 +400,10 @@ class BoardCommunication:
     async def _handle_resign(self, player: Player, data: Dict) -> None:
         """"""
 
-        game = await Game.get(id=data["game_id"]).prefetch_related(
-            "owner", "white", "black", "moves"
-        )
+        live_game = await self.games.get(data["game_id"])
+        game = live_game.game
+        if game.status != Status.IN_PROGRESS:
+            return
 
         result = (
             Status.WHITE_WON
@@ -349,39 +413,24 @@ class BoardCommunication:
             else None
         )
         if result:
-            game.status = result
-            game.finished_at = now()
-
-            message_dict = {
-                "action": "resigned",
-                "color": True if result == Status.BLACK_WON else False,
-            }
-            await asyncio.wait(
-                [
-                    game.send(self.connected_clients_rev, message_dict),
-                    game.save(),
-                    game.invalidate_archive_record_cache(),
-                ]
-            )
+            await self._finish_game(live_game, result, "resigned")
 
     async def _handle_undo(self, player: Player, data: Dict) -> None:
         """"""
 
-        game = await Game.get(id=data["game_id"]).prefetch_related(
-            "owner", "white", "black", "moves"
-        )
-        turn = await game.turn
+        live_game = await self.games.get(data["game_id"])
+        game = live_game.game
+        turn = live_game.turn
 
-        if (turn and player == game.black) or (not turn and player == game.white):
-            move = await Move.filter(game=game).order_by("-index").first()
+        if live_game.move_count and ((turn and player == game.black) or (not turn and player == game.white)):
+            move = live_game.pop()
             id_ = f"{move.x}-{move.y}-{move.color}"
 
             message_dict = {
                 "action": "remove",
                 "id": id_,
             }
-            send_to_game = game.send(self.connected_clients_rev, message_dict)
-            await asyncio.wait([send_to_game, move.delete()])
+            await game.send(self.connected_clients_rev, message_dict)
         else:
             # not your turn
             message_dict = {
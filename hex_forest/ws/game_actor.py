@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import asyncio
+import traceback
+from time import perf_counter
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+MAILBOX_SIZE: int = 32
+"""Actions waiting for one game, a client sending more has to wait for a free slot."""
+
+IDLE_SECONDS: float = 300.0
+"""An actor with no actions for that long stops, a new one is started on the next action."""
+
+Action = Callable[[], Awaitable[None]]
+
+
+class ActorStopped(Exception):
+    """
+    The actor stopped for being idle and takes no more actions, a new one has to be started for the game.
+    """
+
+
+class GameActor:
+    """
+    Applies actions for a single game one after another, in the order they were received.
+
+    Actions for different games run on different actors, so they still interleave freely.
+    """
+
+    def __init__(self, game_id: int, on_stop: Callable[[GameActor], None]) -> None:
+        self.game_id = game_id
+        self.mailbox: asyncio.Queue[Tuple[Action, float]] = asyncio.Queue(maxsize=MAILBOX_SIZE)
+        self.on_stop = on_stop
+        self.task: Optional[asyncio.Task] = None
+        self.stopped: bool = False
+
+        self.processed: int = 0
+        self.failed: int = 0
+        self.max_queue_depth: int = 0
+        self.total_wait_time: float = 0.0
+        self.total_service_time: float = 0.0
+        self.max_service_time: float = 0.0
+
+    async def submit(self, action: Action) -> None:
+        """
+        Queue the action, returns as soon as it is queued.
+
+        :raises ActorStopped: if the actor stopped, so that two actors never run actions of the same game
+        """
+
+        if self.stopped:
+            raise ActorStopped(f"actor of game {self.game_id} stopped")
+
+        await self.mailbox.put((action, perf_counter()))
+        self.max_queue_depth = max(self.max_queue_depth, self.mailbox.qsize())
+
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        """"""
+
+        while True:
+            try:
+                action, queued_at = await asyncio.wait_for(self.mailbox.get(), IDLE_SECONDS)
+            except asyncio.TimeoutError:
+                if self.mailbox.empty():
+                    self.stopped = True
+                    self.task = None
+                    self.on_stop(self)
+                    return
+                continue
+
+            started_at = perf_counter()
+            self.total_wait_time += started_at - queued_at
+            try:
+                await action()
+            except Exception:
+                self.failed += 1
+                traceback.print_exc()
+            finally:
+                service_time = perf_counter() - started_at
+                self.processed += 1
+                self.total_service_time += service_time
+                self.max_service_time = max(self.max_service_time, service_time)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """"""
+
+        return {
+            "queue_depth": self.mailbox.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "processed": self.processed,
+            "failed": self.failed,
+            "mean_wait_time": self.total_wait_time / self.processed if self.processed else 0.0,
+            "mean_service_time": self.total_service_time / self.processed if self.processed else 0.0,
+            "max_service_time": self.max_service_time,
+        }
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import asyncio
+from typing import Dict
+
+from tortoise.timezone import now
+
+from hex_forest.common.board import Board, Connectivity
+from hex_forest.common.codec import encode_moves
+from hex_forest.models import Game, Move
+from hex_forest.models.game import Status
+from hex_forest.models.move import FakeMove
+from hex_forest.ws.game_actor import Action, ActorStopped, GameActor
+from hex_forest.ws.write_behind import CreateMove, DeleteMove, SaveGame, WriteBehindQueue
+
+
+class LiveGame:
+    """
+    Authoritative state of a game that is not finished yet, changed in memory and persisted in the background.
+    """
+
+    game: Game
+    """Game with owner, white and black players loaded."""
+
+    board: Board
+    """Stones on board, the move list and the side to move."""
+
+    def __init__(self, game: Game, board: Board, writes: WriteBehindQueue) -> None:
+        self.game = game
+        self.board = board
+        self.writes = writes
+
+        self.update_game()
+
+    @property
+    def turn(self) -> bool:
+        return self.board.turn
+
+    @property
+    def move_count(self) -> int:
+        return len(self.board.move_stack)
+
+    @property
+    def notation(self) -> str:
+        return "".join([move.get_coord() for move in self.board.move_stack])
+
+    def is_legal(self, x: int, y: int) -> bool:
+        """
+        Is the cell on board and empty.
+        """
+
+        size = self.board.size
+        return 0 <= x < size and 0 <= y < size and bool(self.board.unoccupied & (1 << (x + y * size)))
+
+    def push(self, x: int, y: int) -> FakeMove:
+        """
+        Play a move, -1 for both coordinates is a pass.
+        """
+
+        move = FakeMove(index=self.move_count, x=x, y=y)
+        self.board.push(move)
+        self.update_game()
+
+        self.writes.put(
+            CreateMove(
+                Move(game=self.game, index=move.index, x=x, y=y, done_at=now()),
+                self.game.move_counter,
+                self.game.packed_moves,
+            )
+        )
+        return move
+
+    def pop(self) -> FakeMove:
+        """
+        Take back the last move.
+        """
+
+        move = self.board.pop()
+        self.update_game()
+
+        self.writes.put(
+            DeleteMove(self.game.id, move.index, self.game.move_counter, self.game.packed_moves)
+        )
+        return move
+
+    def update_game(self) -> None:
+        """
+        Keep the denormalized move columns of the game in line with the board.
+        """
+
+        self.game.move_counter = self.move_count
+        self.game.packed_moves = encode_moves(self.board.move_stack, self.board.size)
+
+    def save(self) -> asyncio.Future:
+        """
+        Persist changes of the game itself, like players or status.
+
+        :returns: future set once the change is written, see `WriteBehindQueue.put`
+        """
+
+        return self.writes.put(SaveGame(self.game))
+
+
+class GameRegistry:
+    """
+    Games that are not finished yet, each loaded from the database once and then served from memory.
+
+    Actions on a game are meant to be submitted through `submit`, so that they run one at a time on the game's actor.
+    A game is dropped from memory once it is finished or its actor stopped for being idle, but only after all of its
+    pending writes are committed, so that loading it again reads its latest state.
+    """
+
+    def __init__(self) -> None:
+        self.games: Dict[int, LiveGame] = {}
+        self.actors: Dict[int, GameActor] = {}
+        self.writes = WriteBehindQueue()
+
+    async def submit(self, game_id: int, action: Action) -> None:
+        """
+        Queue the action on the actor of the game.
+        """
+
+        game_id = int(game_id)
+        while True:
+            actor = self.actors.get(game_id)
+            if actor is None or actor.stopped:
+                actor = self.actors[game_id] = GameActor(game_id, self._remove_actor)
+
+            try:
+                await actor.submit(action)
+            except ActorStopped:
+                continue
+            return
+
+    def _remove_actor(self, actor: GameActor) -> None:
+        if self.actors.get(actor.game_id) is actor:
+            del self.actors[actor.game_id]
+
+        live_game = self.games.get(actor.game_id)
+        if live_game is not None:
+            self._evict(live_game)
+
+    def stats(self) -> Dict[int, Dict[str, float]]:
+        """
+        Queue depth and timings of every running actor.
+        """
+
+        return {game_id: actor.stats for game_id, actor in self.actors.items()}
+
+    async def get(self, game_id: int) -> LiveGame:
+        """"""
+
+        game_id = int(game_id)
+        live_game = self.games.get(game_id)
+        if live_game is None:
+            live_game = await self.load(game_id)
+
+            # another request could load the same game meanwhile, the first one to finish wins
+            live_game = self.games.setdefault(game_id, live_game)
+
+        return live_game
+
+    async def load(self, game_id: int) -> LiveGame:
+        """"""
+
+        game = await Game.get(id=game_id).prefetch_related("owner", "white", "black")
+
+        board = Board(size=game.board_size, connectivity=Connectivity.UNION_FIND)
+        for move in game.fake_moves:
+            board.push(move)
+
+        return LiveGame(game, board, self.writes)
+
+    def finish(self, live_game: LiveGame) -> None:
+        """
+        Persist the finished game and stop keeping it in memory.
+        """
+
+        live_game.save()
+        self._evict(live_game)
+
+    def _evict(self, live_game: LiveGame) -> None:
+        """
+        Drop the game from memory if it is finished or idle, once its pending writes are committed.
+        """
+
+        game_id = live_game.game.id
+        if self.games.get(game_id) is not live_game:
+            return
+
+        finished = live_game.game.status in (Status.WHITE_WON, Status.BLACK_WON)
+        if not finished and game_id in self.actors:
+            return
+
+        ack = self.writes.last_ack(game_id)
+        if ack is not None:
+            # writes queued meanwhile are waited for too, and the game could become active again
+            ack.add_done_callback(lambda _: self._evict(live_game))
+            return
+
+        del self.games[game_id]
+
+    async def flush(self) -> None:
+        """"""
+
+        await self.writes.flush()
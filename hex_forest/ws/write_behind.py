@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import asyncio
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+from tortoise.exceptions import IntegrityError
+from tortoise.transactions import in_transaction
+
+from hex_forest.common.codec import Packed
+from hex_forest.models import Game, Move
+
+FLUSH_DELAY: float = 0.05
+"""Seconds to wait after the first pending write, for more writes to join the batch."""
+
+RETRY_DELAY: float = 1.0
+"""Seconds to wait before retrying a batch that failed."""
+
+BATCH_SIZE: int = 256
+
+GAME_FIELDS: Tuple[str, ...] = ("white_id", "black_id", "status", "swapped", "started_at", "finished_at")
+"""Fields written by `SaveGame`, move columns are written only together with the moves they describe."""
+
+
+@dataclass
+class CreateMove:
+    move: Move
+    move_counter: int
+    packed_moves: Packed
+    """State of the game's move columns right after this move."""
+
+
+@dataclass
+class DeleteMove:
+    game_id: int
+    index: int
+    move_counter: int
+    packed_moves: Packed
+    """State of the game's move columns right after the move was taken back."""
+
+
+@dataclass
+class SaveGame:
+    game: Game
+
+
+Write = Union[CreateMove, DeleteMove, SaveGame]
+
+
+def write_game_id(write: Write) -> int:
+    """"""
+
+    if isinstance(write, CreateMove):
+        return write.move.game_id
+    if isinstance(write, DeleteMove):
+        return write.game_id
+    return write.game.id
+
+
+class WriteBehindQueue:
+    """
+    Persists changes to live games in the background, in the same order they were accepted.
+
+    Writes are applied in batches, each batch in a single transaction, and are removed from the queue only after the
+    transaction commits. A failed batch is retried as a whole before anything queued after it, so the database never
+    holds a later change of a game without all the earlier ones. Only a write the database rejects by a constraint is
+    dropped, after retrying one by one to find it, as it would otherwise block all the following ones.
+
+    Batches are applied one at a time under a lock, whether by the background task or by `flush`.
+    """
+
+    def __init__(self) -> None:
+        self.pending: Deque[Write] = deque()
+        self.acks: Deque[asyncio.Future] = deque()
+        """Future of every pending write, in the same order."""
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def put(self, write: Write) -> asyncio.Future:
+        """
+        :returns: future set to True once the write is committed, or to False if it was dropped
+        """
+
+        ack = asyncio.get_running_loop().create_future()
+        self.pending.append(write)
+        self.acks.append(ack)
+
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+        return ack
+
+    def last_ack(self, game_id: int) -> Optional[asyncio.Future]:
+        """
+        Future of the last pending write of the game, None if nothing of the game is pending.
+        """
+
+        for write, ack in zip(reversed(self.pending), reversed(self.acks)):
+            if write_game_id(write) == game_id:
+                return ack
+        return None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _run(self) -> None:
+        """"""
+
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            await asyncio.sleep(FLUSH_DELAY)
+
+            batch_size = BATCH_SIZE
+            while self.pending:
+                try:
+                    await self.flush_batch(batch_size, drop_rejected=batch_size == 1)
+                except IntegrityError:
+                    traceback.print_exc()
+                    batch_size = 1
+                except Exception:
+                    traceback.print_exc()
+                    await asyncio.sleep(RETRY_DELAY)
+                else:
+                    batch_size = BATCH_SIZE
+
+    async def flush(self) -> None:
+        """
+        Write everything that is pending, e.g. before shutdown.
+        """
+
+        while self.pending:
+            await self.flush_batch()
+
+    async def flush_batch(self, batch_size: int = BATCH_SIZE, drop_rejected: bool = False) -> None:
+        """
+        :param drop_rejected: drop the batch instead of raising if the database rejects it by a constraint
+        """
+
+        async with self.lock:
+            batch: List[Write] = [self.pending[i] for i in range(min(batch_size, len(self.pending)))]
+            if not batch:
+                return
+
+            try:
+                await self._apply(batch)
+            except IntegrityError:
+                if not drop_rejected:
+                    raise
+                traceback.print_exc()
+                print(f"dropping writes rejected by the database: {batch}")
+                committed = False
+            else:
+                committed = True
+
+            for _ in batch:
+                self.pending.popleft()
+                ack = self.acks.popleft()
+                if not ack.done():
+                    ack.set_result(committed)
+
+    @staticmethod
+    async def _apply(batch: List[Write]) -> None:
+        """"""
+
+        async with in_transaction() as connection:
+            game_moves: Dict[int, Tuple[int, Packed]] = {}
+            moves: List[Move] = []
+            for write in batch:
+                if isinstance(write, CreateMove):
+                    moves.append(write.move)
+                    game_moves[write.move.game_id] = (write.move_counter, write.packed_moves)
+                    continue
+
+                # consecutive creates go in one insert, anything else has to wait for them
+                if moves:
+                    await Move.bulk_create(moves, using_db=connection)
+                    moves = []
+
+                if isinstance(write, DeleteMove):
+                    await Move.filter(game_id=write.game_id, index=write.index).using_db(connection).delete()
+                    game_moves[write.game_id] = (write.move_counter, write.packed_moves)
+                else:
+                    await write.game.save(using_db=connection, update_fields=GAME_FIELDS)
+
+            if moves:
+                await Move.bulk_create(moves, using_db=connection)
+
+            for game_id, (move_counter, packed_moves) in game_moves.items():
+                await Game.filter(id=game_id).using_db(connection).update(
+                    move_counter=move_counter, packed_moves=packed_moves
+                )
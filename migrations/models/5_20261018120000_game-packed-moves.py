@@ -0,0 +1,24 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "game" ADD "move_counter" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "game" ADD "packed_moves" BYTEA;
+        UPDATE "game" SET "move_counter" = counted.c, "packed_moves" = counted.packed FROM (
+            SELECT move.game_id, count(*) AS c, string_agg(
+                CASE WHEN game.board_size * game.board_size < 255
+                    THEN set_byte(decode('00', 'hex'), 0, CASE WHEN move.x = -1 THEN 255 ELSE move.x + move.y * game.board_size END)
+                    ELSE set_byte(set_byte(decode('0000', 'hex'),
+                        0, CASE WHEN move.x = -1 THEN 255 ELSE (move.x + move.y * game.board_size) % 256 END),
+                        1, CASE WHEN move.x = -1 THEN 255 ELSE (move.x + move.y * game.board_size) / 256 END)
+                END, ''::bytea ORDER BY move.index
+            ) AS packed
+            FROM "move" JOIN "game" ON game.id = move.game_id GROUP BY move.game_id
+        ) counted WHERE counted.game_id = game.id;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "game" DROP COLUMN "move_counter";
+        ALTER TABLE "game" DROP COLUMN "packed_moves";"""
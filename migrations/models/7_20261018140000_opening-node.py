@@ -0,0 +1,75 @@
+from collections import Counter, defaultdict
+from typing import Dict, Tuple
+
+from tortoise import BaseDBAsyncClient
+
+from hex_forest.common.codec import decode_moves
+from hex_forest.common.openings import game_positions, next_moves, to_signed
+from hex_forest.models.game import Status
+
+BATCH_SIZE: int = 1000
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    await db.execute_script(
+        """
+        CREATE TABLE IF NOT EXISTS "opening_node" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "board_size" INT NOT NULL,
+    "position_hash" BIGINT NOT NULL,
+    "x" INT NOT NULL,
+    "y" INT NOT NULL,
+    "number" INT NOT NULL  DEFAULT 0,
+    "black_wins" INT NOT NULL  DEFAULT 0,
+    CONSTRAINT "uid_opening_nod_board_s_6a1c1e" UNIQUE ("board_size", "position_hash", "x", "y")
+);
+COMMENT ON TABLE "opening_node" IS 'Next moves played in finished games from a position, with positions folded by `FOLDING`.';"""
+    )
+
+    # nodes are counted in python, the same way as for games finished from now on
+    number: Dict[int, Counter] = defaultdict(Counter)
+    black_wins: Dict[int, Counter] = defaultdict(Counter)
+    last_id = 0
+    while True:
+        _, games = await db.execute_query(
+            f"""
+            SELECT "id", "board_size", "status", "swapped", "packed_moves" FROM "game"
+            WHERE "status" IN ({Status.WHITE_WON}, {Status.BLACK_WON}) AND "id" > {last_id}
+            ORDER BY "id" LIMIT {BATCH_SIZE}"""
+        )
+        if not games:
+            break
+
+        for game in games:
+            size = game["board_size"]
+            black_won = (game["status"] == Status.BLACK_WON and not game["swapped"]) or (
+                game["status"] == Status.WHITE_WON and game["swapped"]
+            )
+            moves = decode_moves(game["packed_moves"] or b"", size)
+            for position_hash, symmetries, move in game_positions(moves, size):
+                for x, y in next_moves(move, symmetries, size):
+                    node: Tuple[int, int, int] = (to_signed(position_hash), x, y)
+                    number[size][node] += 1
+                    black_wins[size][node] += black_won
+        last_id = games[-1]["id"]
+
+    for size, nodes in number.items():
+        values = [
+            f"({size}, {position_hash}, {x}, {y}, {count}, {black_wins[size][(position_hash, x, y)]})"
+            for (position_hash, x, y), count in sorted(nodes.items())
+        ]
+        for start in range(0, len(values), BATCH_SIZE):
+            await db.execute_script(
+                f"""
+                INSERT INTO "opening_node" ("board_size", "position_hash", "x", "y", "number", "black_wins")
+                VALUES {",".join(values[start : start + BATCH_SIZE])} ON CONFLICT DO NOTHING;"""
+            )
+
+    # statistics of the backfilled table, so that suggestions are planned on the index right away
+    return """
+        ANALYZE "opening_node";"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "opening_node";"""
@@ -134,6 +134,7 @@ function connect() {
                 chatMessage(data);
                 break;
             case 'resigned':
+            case 'won':
                 handleResigned(data);
                 break;
 
@@ -11,7 +11,7 @@ from typing import Optional, Dict
 import requests
 from websockets.server import WebSocketServerProtocol
 
-from hex_forest.common.board import Cell
+from hex_forest.common.cell import Cell
 from hex_forest.constants import STORE_MINIMUM, WHITE_COLOR, BLACK_COLOR
 from hex_forest.models.player import OnlinePlayer as Player
 